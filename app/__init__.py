@@ -5,13 +5,14 @@
 
 import os
 import json
+import time
 import logging
-from waitress import serve
+from waitress import create_server
 import flask
-from flask import Flask
+from flask import Flask, request, g
 from flask_cors import CORS
 
-from .utils import setup_logger
+from .utils import setup_logger, new_trace_id, reset_trace_id, get_trace_id
 from .routes import Routes
 
 
@@ -25,12 +26,22 @@ class YouTubeDownloaderAPI:
         Args:
             config_path (str): Путь к файлу конфигурации.
         """
+        started = time.perf_counter()
+        
         # Загрузка конфигурации
         self.config = self._load_config(config_path)
         
         # Настройка логгера
-        setup_logger(self.config["downloader"]["log_file"])
+        log_config = self.config.get("logging", {})
+        setup_logger(
+            self.config["downloader"]["log_file"],
+            level=getattr(logging, log_config.get("level", "INFO").upper(), logging.INFO),
+            json_format=log_config.get("json", True),
+            queue_size=log_config.get("queue_size", 10000),
+            sample_rate=log_config.get("sample_rate", 1.0)
+        )
         self.logger = logging.getLogger(__name__)
+        self.access_logger = logging.getLogger("access")
         
         # Создание директорий для загрузок и временных файлов
         self._create_directories()
@@ -50,10 +61,34 @@ class YouTubeDownloaderAPI:
         # Настройка CORS
         CORS(self.app, origins=self.config["api"]["cors_origin"])
         
+        # Trace ID и журнал доступа для каждого запроса
+        self.app.before_request(self._start_request)
+        self.app.after_request(self._finish_request)
+        self.app.teardown_request(self._teardown_request)
+        
         # Регистрация маршрутов
-        Routes(self.app, self.config).register_routes()
+        routes = Routes(self.app, self.config)
+        routes.register_routes()
+        
+        # Хранилище результатов (горячий кэш + общее хранилище)
+        self.storage = routes.video_service.storage
+        
+        # Прогрев yt_dlp и ffmpeg: 'background' - после открытия порта (в run),
+        # 'eager' - до открытия порта, 'lazy' - при первой загрузке
+        self.warmup = routes.video_service.warmup
+        self.warmup_mode = warmup_mode = self.config["server"].get("warmup", "background")
+        if warmup_mode not in ("background", "eager", "lazy"):
+            raise ValueError(f"Unknown warmup mode: {warmup_mode}")
+        if warmup_mode == "eager":
+            # Неудачный прогрев не мешает старту: он повторяется в фоне, а /ready отвечает 503
+            if not self.warmup.run():
+                self.warmup.start()
+        elif warmup_mode == "lazy":
+            self.warmup.skip()
         
-        self.logger.info("YouTube Downloader API Service initialized")
+        startup_ms = (time.perf_counter() - started) * 1000
+        self.logger.info("YouTube Downloader API Service initialized in %.1f ms", startup_ms,
+                         extra={"stage": "startup", "duration_ms": round(startup_ms, 1), "warmup": warmup_mode})
 
     def _load_config(self, config_path):
         """
@@ -83,7 +118,45 @@ class YouTubeDownloaderAPI:
         for directory in [download_dir, temp_dir, static_dir]:
             if not os.path.exists(directory):
                 os.makedirs(directory)
-                self.logger.info(f"Created directory: {directory}")
+                self.logger.info("Created directory: %s", directory)
+
+    def _start_request(self):
+        """Назначение trace ID запросу (из заголовка X-Request-ID или нового)."""
+        g.trace_token = new_trace_id(request.headers.get("X-Request-ID"))
+        g.request_started = time.perf_counter()
+
+    def _finish_request(self, response):
+        """
+        Запись в журнал доступа и возврат trace ID клиенту.
+
+        Args:
+            response (Response): Flask-ответ.
+
+        Returns:
+            Response: Ответ с заголовком X-Request-ID.
+        """
+        response.headers["X-Request-ID"] = get_trace_id()
+        
+        if self.config["api"].get("access_log", True):
+            duration_ms = (time.perf_counter() - g.request_started) * 1000
+            self.access_logger.info(
+                "%s %s %s %.1f ms", request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(duration_ms, 1),
+                    "client": request.remote_addr
+                }
+            )
+            
+        return response
+
+    def _teardown_request(self, exc):
+        """Сброс trace ID после обработки запроса."""
+        token = g.pop("trace_token", None)
+        if token is not None:
+            reset_trace_id(token)
 
     def _serve_media_files(self, filename):
         """
@@ -96,6 +169,11 @@ class YouTubeDownloaderAPI:
             Response: Flask-ответ с файлом.
         """
         download_dir = self.config["downloader"]["download_dir"]
+        
+        # Файл мог быть вытеснен из горячего кэша или загружен другой репликой
+        if not self.storage.ensure_local(filename):
+            flask.abort(404)
+            
         return flask.send_from_directory(download_dir, filename)
 
     def run(self):
@@ -104,10 +182,15 @@ class YouTubeDownloaderAPI:
         port = self.config["server"]["port"]
         workers = self.config["server"]["workers"]
         
-        self.logger.info(f"Starting YouTube Downloader API Service on {host}:{port}")
+        self.logger.info("Starting YouTube Downloader API Service on %s:%s", host, port)
+        
+        # create_server открывает порт, поэтому фоновый прогрев запускается уже после этого
+        server = create_server(self.app, host=host, port=port, threads=workers)
+        if self.warmup_mode == "background":
+            self.warmup.start()
         
         # Запуск сервера с помощью Waitress
-        serve(self.app, host=host, port=port, threads=workers)
+        server.run()
 
 
 def create_app(config_path="config.json"):
@@ -121,4 +204,7 @@ def create_app(config_path="config.json"):
         Flask: Инициализированное Flask-приложение.
     """
     api = YouTubeDownloaderAPI(config_path)
+    # Порт открывает внешний WSGI-сервер, поэтому фоновый прогрев запускается сразу
+    if api.warmup_mode == "background":
+        api.warmup.start()
     return api.app
@@ -8,17 +8,56 @@ import logging
 import re
 import uuid
 import glob
+import time
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
 
-from yt_dlp import YoutubeDL
-import ffmpeg
+from .session_pool import YoutubeDLPool
+from .transcoder import Transcoder
+from .sidecars import SidecarFetcher
+from .stream_store import StreamStore
+from .utils import log_stage
+from .resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    classify_error,
+    ERROR_FORMAT,
+    ERROR_PERMANENT
+)
+
+
+# Профиль опций для извлечения информации о видео
+INFO_OPTIONS = {'quiet': True, 'skip_download': True}
+
+# Профиль опций для получения списка видео канала или плейлиста без их разбора
+PLAYLIST_OPTIONS = {'quiet': True, 'skip_download': True, 'extract_flat': 'in_playlist'}
+
+# Профиль опций для загрузки потоков; формат и путь задаются для каждого запроса
+DOWNLOAD_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,  # Отключаем вывод прогресса
+    # Повторы выполняет RetryPolicy: встроенные повторы yt-dlp умножили бы число
+    # запросов на каждую попытку во время волны ограничений. .part файл докачивается при повторе
+    'retries': 0,
+    'fragment_retries': 0,
+    # Недоступный фрагмент - ошибка загрузки, а не пропуск: иначе недокачанный
+    # фрагментированный поток попал бы в хранилище потоков как целый
+    'skip_unavailable_fragments': False,
+    'continuedl': True,
+    # Сохраняем потоки в оригинальном формате без перекодирования
+    'postprocessor_args': {
+        'ffmpeg': ['-c:v', 'copy', '-c:a', 'copy']
+    }
+}
 
 
 class YouTubeDownloader:
     """Класс для скачивания видео и аудио с YouTube."""
 
-    def __init__(self, download_dir, temp_dir, base_url):
+    def __init__(self, download_dir, temp_dir, base_url, storage=None, session_pool=None,
+                 retry_policy=None, circuit_breaker=None, transcoder=None, sidecar_fetcher=None,
+                 stream_store=None):
         """
         Инициализация объекта YouTubeDownloader.
 
@@ -26,10 +65,24 @@ class YouTubeDownloader:
             download_dir (str): Директория для сохранения загруженных файлов.
             temp_dir (str): Директория для временных файлов.
             base_url (str): Базовый URL для доступа к загруженным файлам.
+            storage (ResultStorage, optional): Хранилище готовых результатов.
+            session_pool (YoutubeDLPool, optional): Пул сессий YoutubeDL.
+            retry_policy (RetryPolicy, optional): Политика повторных попыток загрузки.
+            circuit_breaker (CircuitBreaker, optional): Выключатель по ошибкам экстрактора.
+            transcoder (Transcoder, optional): Перекодировщик аудио по профилям.
+            sidecar_fetcher (SidecarFetcher, optional): Загрузчик обложек, субтитров и глав.
+            stream_store (StreamStore, optional): Хранилище исходных потоков.
         """
         self.download_dir = download_dir
         self.temp_dir = temp_dir
         self.base_url = base_url
+        self.storage = storage
+        self.session_pool = session_pool or YoutubeDLPool()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.transcoder = transcoder or Transcoder()
+        self.sidecar_fetcher = sidecar_fetcher or SidecarFetcher(download_dir, base_url, storage)
+        self.stream_store = stream_store or StreamStore(os.path.join(temp_dir, "streams"))
         self.logger = logging.getLogger(__name__)
 
     def _sanitize_filename(self, filename):
@@ -85,6 +138,24 @@ class YouTubeDownloader:
 
         return None
 
+    def _record_extractor_error(self, error):
+        """
+        Учет ошибки экстрактора в выключателе.
+
+        Args:
+            error (Exception): Ошибка yt-dlp.
+
+        Returns:
+            str: Класс ошибки.
+        """
+        error_class = classify_error(error)
+        
+        # Недоступное видео - не признак проблем с экстрактором
+        if error_class != ERROR_PERMANENT:
+            self.circuit_breaker.record_failure()
+            
+        return error_class
+
     def _validate_youtube_url(self, url):
         """
         Проверяет, является ли URL действительной ссылкой на YouTube видео.
@@ -95,22 +166,24 @@ class YouTubeDownloader:
         Returns:
             bool: True, если URL действителен, False в противном случае.
         """
-        self.logger.info(f"Validating YouTube URL: {url}")
+        self.logger.info("Validating YouTube URL: %s", url)
         
         video_id = self._get_video_id(url)
         if not video_id:
-            self.logger.warning(f"Invalid YouTube URL format: {url}")
+            self.logger.warning("Invalid YouTube URL format: %s", url)
             return False
         
         try:
-            with YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
+            with self.session_pool.session(INFO_OPTIONS) as ydl:
                 info_dict = ydl.extract_info(url, download=False)
                 if not info_dict:
-                    self.logger.warning(f"Cannot extract info from YouTube URL: {url}")
+                    self.logger.warning("Cannot extract info from YouTube URL: %s", url)
                     return False
+                self.circuit_breaker.record_success()
                 return True
         except Exception as e:
-            self.logger.error(f"Error validating YouTube URL {url}: {e}")
+            self._record_extractor_error(e)
+            self.logger.error("Error validating YouTube URL %s: %s", url, e)
             return False
 
     def _get_video_info(self, url):
@@ -123,14 +196,16 @@ class YouTubeDownloader:
         Returns:
             dict: Словарь с информацией о видео или None в случае ошибки.
         """
-        self.logger.info(f"Getting video info for: {url}")
+        self.logger.info("Getting video info for: %s", url)
         try:
-            with YoutubeDL({'quiet': True, 'skip_download': True}) as ydl:
+            with self.session_pool.session(INFO_OPTIONS) as ydl:
                 info_dict = ydl.extract_info(url, download=False)
-                self.logger.info(f"Retrieved video info: {info_dict.get('title', 'Unknown title')}")
+                self.logger.info("Retrieved video info: %s", info_dict.get('title', 'Unknown title'))
+                self.circuit_breaker.record_success()
                 return info_dict
         except Exception as e:
-            self.logger.error(f"Error getting video info from {url}: {e}")
+            self._record_extractor_error(e)
+            self.logger.error("Error getting video info from %s: %s", url, e)
             return None
 
     def _generate_output_filename(self, video_title, video_id, suffix="", extension=""):
@@ -166,7 +241,7 @@ class YouTubeDownloader:
             
         return filename
 
-    def _download_stream(self, url, format_code, output_path):
+    def _download_stream(self, url, format_code, output_path, info_dict=None, format_id=None):
         """
         Загружает один поток (видео или аудио) с YouTube.
         
@@ -174,38 +249,61 @@ class YouTubeDownloader:
             url (str): URL видео на YouTube.
             format_code (str): Код формата для загрузки (например, 'bestvideo[height<=720]').
             output_path (str): Путь для сохранения файла.
+            info_dict (dict, optional): Информация о видео для выбора альтернативного формата.
+            format_id (str, optional): Формат, заранее выбранный для format_code.
             
         Returns:
             dict: Информация о загруженном файле или None в случае ошибки.
         """
-        try:
-            # Определяем тип потока для логов
-            stream_type = "audio" if "audio" in format_code else "video"
-            
-            self.logger.info(f"Downloading {stream_type} stream")
-            
-            # Настраиваем опции для yt-dlp
-            ydl_opts = {
-                'format': format_code,
-                'outtmpl': output_path,
-                'quiet': True,
-                'no_warnings': True,
-                'noprogress': True,  # Отключаем вывод прогресса
-                # Сохраняем потоки в оригинальном формате без перекодирования
-                'postprocessor_args': {
-                    'ffmpeg': ['-c:v', 'copy', '-c:a', 'copy']
+        # Определяем тип потока для логов
+        stream_type = "audio" if "audio" in format_code else "video"
+        
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            # Формат, который выбрал yt-dlp; progress_hook не вызывается, если ссылка
+            # на формат отвергнута (403/410) еще до начала загрузки
+            selected = {'format_id': format_id} if format_id else {}
+            
+            def progress_hook(status):
+                format_id = status.get('info_dict', {}).get('format_id')
+                if format_id:
+                    selected['format_id'] = format_id
+            
+            try:
+                self.logger.info("Downloading %s stream (attempt %s)", stream_type, attempt)
+                
+                # Опции конкретного запроса поверх общего профиля загрузки
+                overrides = {
+                    'format': format_code,
+                    'outtmpl': output_path,
+                    'progress_hooks': [progress_hook]
                 }
-            }
-            
-            # Выполняем загрузку
-            with YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                self.logger.info(f"{stream_type.capitalize()} stream downloaded")
+                
+                # Выполняем загрузку; недокачанный .part файл продолжится при повторе
+                with self.session_pool.session(DOWNLOAD_OPTIONS, overrides) as ydl:
+                    info = ydl.extract_info(url, download=True)
+                    
+                # Один исход на загрузку потока, а не на каждую попытку
+                self.circuit_breaker.record_success()
+                self.logger.info("%s stream downloaded", stream_type.capitalize())
                 return info
+                    
+            except Exception as e:
+                error_class = classify_error(e)
                 
-        except Exception as e:
-            self.logger.error(f"Error downloading {stream_type} from {url}: {e}")
-            return None
+                if error_class == ERROR_PERMANENT or attempt == self.retry_policy.max_attempts:
+                    self._record_extractor_error(e)
+                    self.logger.error("Error downloading %s from %s: %s", stream_type, url, e)
+                    return None
+                
+                # Ссылка на формат недействительна - переходим на другой формат того же качества
+                if error_class == ERROR_FORMAT and selected.get('format_id'):
+                    format_code = f"{format_code}[format_id!={selected['format_id']}]"
+                    format_id = self._select_format(info_dict, format_code) if info_dict else None
+                    self.logger.warning("Format %s failed, falling back to %s", selected['format_id'], format_code)
+                
+                delay = self.retry_policy.delay(attempt)
+                self.logger.warning("Retrying %s download in %.1fs after %s error: %s", stream_type, delay, error_class, e)
+                time.sleep(delay)
 
     def _find_file_by_pattern(self, pattern):
         """
@@ -219,12 +317,85 @@ class YouTubeDownloader:
         """
         files = glob.glob(pattern)
         if files:
-            self.logger.debug(f"Found file with original extension: {files[0]}")
+            self.logger.debug("Found file with original extension: %s", files[0])
             return files[0]
         else:
-            self.logger.warning(f"No files found matching pattern: {pattern}")
+            self.logger.warning("No files found matching pattern: %s", pattern)
             return None
 
+    def _select_format(self, info_dict, format_code):
+        """
+        Определение формата, который yt-dlp выберет для кода формата, без загрузки.
+
+        Args:
+            info_dict (dict): Информация о видео с форматами.
+            format_code (str): Код формата (например, 'bestaudio').
+
+        Returns:
+            str: format_id или None, если формат определить не удалось.
+        """
+        formats = info_dict.get('formats') or []
+        if not formats:
+            return None
+            
+        ctx = {
+            'formats': formats,
+            'has_merged_format': any('none' not in (f.get('acodec'), f.get('vcodec')) for f in formats),
+            'incomplete_formats': all(f.get('vcodec') == 'none' for f in formats) or
+                                  all(f.get('acodec') == 'none' for f in formats)
+        }
+        try:
+            with self.session_pool.session(DOWNLOAD_OPTIONS) as ydl:
+                selected = next(iter(ydl.build_format_selector(format_code)(ctx)), None)
+        except Exception as e:
+            self.logger.warning("Cannot select format %s: %s", format_code, e)
+            return None
+            
+        return selected.get('format_id') if selected else None
+
+    def _fetch_stream(self, url, info_dict, video_id, format_code, stream_type, lease):
+        """
+        Получение потока из хранилища потоков или его загрузка с YouTube.
+
+        Args:
+            url (str): URL видео на YouTube.
+            info_dict (dict): Информация о видео.
+            video_id (str): ID видео.
+            format_code (str): Код формата.
+            stream_type (str): 'video' или 'audio' для логов и этапов.
+            lease (list): Аренда StreamStore.lease(): поток не вытесняется, пока задача его использует.
+
+        Returns:
+            str: Путь к проверенному потоку или None в случае ошибки.
+        """
+        format_id = self._select_format(info_dict, format_code)
+        key = format_id or format_code
+        
+        with self.stream_store.lock(video_id, key):
+            if format_id:
+                stream_path = self.stream_store.get(video_id, format_id, lease)
+                if stream_path:
+                    self.logger.info("Reusing %s stream %s/%s", stream_type, video_id, format_id)
+                    return stream_path
+                    
+            staging_path = self.stream_store.staging_path(video_id, key)
+            with log_stage(self.logger, f"download_{stream_type}_stream"):
+                stream_info = self._download_stream(
+                    url, format_code, f"{staging_path}.%(ext)s", info_dict=info_dict, format_id=format_id
+                )
+            if not stream_info:
+                return None
+                
+            # После переключения на альтернативный формат format_id может отличаться от выбранного
+            downloads = stream_info.get('requested_downloads') or [{}]
+            downloaded_path = downloads[0].get('filepath') or self._find_file_by_pattern(f"{staging_path}.*")
+            if not downloaded_path or not os.path.isfile(downloaded_path):
+                self.logger.error("Could not find downloaded %s stream", stream_type)
+                return None
+                
+            # Недокачанный файл yt-dlp отклоняет сам (проверка Content-Length до постобработки)
+            return self.stream_store.commit(video_id, stream_info.get('format_id') or key, downloaded_path, lease)
+
     def _merge_video_audio(self, video_path, audio_path, output_path):
         """
         Объединение видео и аудио в один файл с помощью ffmpeg.
@@ -247,7 +418,8 @@ class YouTubeDownloader:
             if not os.path.exists(audio_path):
                 raise FileNotFoundError(f"Audio file not found: {audio_path}")
                 
-            # Объединяем файлы с помощью ffmpeg
+            # Объединяем файлы с помощью ffmpeg (импорт откладывается до первой загрузки)
+            import ffmpeg
             ffmpeg.input(video_path).output(
                 ffmpeg.input(audio_path),
                 output_path,
@@ -256,24 +428,129 @@ class YouTubeDownloader:
                 loglevel='quiet'
             ).run(overwrite_output=True)
             
-            # Удаляем временные файлы после успешного объединения
-            os.remove(video_path)
-            os.remove(audio_path)
-            
-            self.logger.info(f"Video and audio merged successfully")
+            # Исходные потоки остаются в хранилище потоков для других разрешений и профилей
+            self.logger.info("Video and audio merged successfully")
             return True
             
         except Exception as e:
-            self.logger.error(f"Error merging video and audio: {e}")
+            self.logger.error("Error merging video and audio: %s", e)
             return False
 
-    def download_video(self, url, resolution=720):
+    def list_playlist(self, url, max_items=10):
+        """
+        Получает ссылки на последние видео канала или плейлиста.
+
+        Args:
+            url (str): URL канала (например, '.../@channel/videos') или плейлиста.
+            max_items (int): Максимальное количество видео.
+
+        Returns:
+            list: Список URL видео (пустой в случае ошибки).
+        """
+        self.logger.info("Listing playlist: %s", url)
+        try:
+            with self.session_pool.session(dict(PLAYLIST_OPTIONS, playlistend=max_items)) as ydl:
+                info_dict = ydl.extract_info(url, download=False)
+            self.circuit_breaker.record_success()
+        except Exception as e:
+            self._record_extractor_error(e)
+            self.logger.error("Error listing playlist %s: %s", url, e)
+            return []
+            
+        urls = []
+        for entry in (info_dict or {}).get('entries') or []:
+            # Вложенные вкладки канала и плейлисты пропускаем
+            if not entry or not entry.get('id') or entry.get('ie_key', 'Youtube') != 'Youtube':
+                continue
+            urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+            
+        return urls[:max_items]
+
+    def find_cached(self, url, suffix):
+        """
+        Поиск уже готового результата в хранилище без обращения к YouTube.
+
+        Args:
+            url (str): URL видео на YouTube.
+            suffix (str): Вариант результата (например, '720p', 'audio', 'mp3').
+
+        Returns:
+            dict: Информация о файле или None, если результата нет.
+        """
+        video_id = self._get_video_id(url)
+        if self.storage is None or not video_id:
+            return None
+        return self.storage.lookup(video_id, suffix)
+
+    def _build_result(self, output_path, video_id, suffix, title, duration):
+        """
+        Формирование ответа и регистрация файла в хранилище.
+
+        Args:
+            output_path (str): Путь к готовому файлу.
+            video_id (str): ID видео.
+            suffix (str): Вариант результата.
+            title (str): Название видео.
+            duration (int): Длительность в секундах.
+
+        Returns:
+            dict: Информация о загруженном файле.
+        """
+        if self.storage is not None:
+            return self.storage.store(output_path, video_id, suffix, title, duration)
+
+        filename = os.path.basename(output_path)
+        return {
+            "local_path": output_path,
+            "url": f"{self.base_url}/{filename}",
+            "title": title,
+            "duration": duration
+        }
+
+    def sidecars_cached(self, url, sidecars):
+        """
+        Проверка, что сопутствующие файлы можно добавить без обращения к YouTube.
+
+        Args:
+            url (str): URL видео на YouTube.
+            sidecars (dict, optional): Параметры из SidecarFetcher.parse_options.
+
+        Returns:
+            bool: True, если файлы не запрошены или все уже в кэше.
+        """
+        return not sidecars or self.sidecar_fetcher.cached(self._get_video_id(url), sidecars)
+
+    def attach_sidecars(self, result, url, sidecars):
+        """
+        Добавление сопутствующих файлов к готовому результату.
+
+        Args:
+            result (dict): Информация о файле.
+            url (str): URL видео на YouTube.
+            sidecars (dict, optional): Параметры из SidecarFetcher.parse_options.
+
+        Returns:
+            dict: Информация о файле с полем "sidecars" или None, если их не удалось загрузить.
+        """
+        if not sidecars:
+            return result
+            
+        with log_stage(self.logger, "sidecars"):
+            fetched = self.sidecar_fetcher.fetch(
+                self._get_video_id(url), sidecars, lambda: self._get_video_info(url)
+            )
+        if fetched is None:
+            return None
+        return dict(result, sidecars=fetched)
+
+    def download_video(self, url, resolution=720, sidecars=None):
         """
         Загружает видео с YouTube в указанном разрешении.
 
         Args:
             url (str): URL видео на YouTube.
             resolution (int): Желаемое разрешение видео.
+            sidecars (dict, optional): Параметры обложки, субтитров и глав.
 
         Returns:
             dict: Информация о загруженном файле или None в случае ошибки.
@@ -284,15 +561,24 @@ class YouTubeDownloader:
                     "duration": "длительность в секундах"
                 }
         """
-        self.logger.info(f"Request to download video: {url} with resolution {resolution}p")
+        self.logger.info("Request to download video: %s with resolution %sp", url, resolution)
         
-        if not self._validate_youtube_url(url):
-            self.logger.error(f"Invalid YouTube URL: {url}")
+        # Проверка готового результата до обращения к YouTube
+        cached = self.find_cached(url, f"{resolution}p")
+        if cached:
+            return self.attach_sidecars(cached, url, sidecars)
+        
+        with log_stage(self.logger, "validate"):
+            valid = self._validate_youtube_url(url)
+            
+        if not valid:
+            self.logger.error("Invalid YouTube URL: %s", url)
             return None
             
         try:
             # Получение информации о видео
-            info_dict = self._get_video_info(url)
+            with log_stage(self.logger, "video_info"):
+                info_dict = self._get_video_info(url)
             if not info_dict:
                 return None
                 
@@ -300,62 +586,54 @@ class YouTubeDownloader:
             video_id = self._get_video_id(url)
             duration = info_dict.get('duration', 0)
             
-            # Создаем имена временных файлов с маской для расширения
-            temp_video_filename = f"{video_id}_video.%(ext)s"
-            temp_audio_filename = f"{video_id}_audio.%(ext)s"
-            
-            temp_video_path = os.path.join(self.temp_dir, temp_video_filename)
-            temp_audio_path = os.path.join(self.temp_dir, temp_audio_filename)
+            # Сопутствующие файлы загружаются параллельно с медиапотоками
+            sidecar_futures = self.sidecar_fetcher.submit(video_id, sidecars, info_dict) if sidecars else None
             
             # Формирование имени финального файла
             output_filename = self._generate_output_filename(video_title, video_id, f"{resolution}p", ".mkv")
             output_path = os.path.join(self.download_dir, output_filename)
             
-            # Загрузка видео потока
-            self._download_stream(url, f'bestvideo[height<={resolution}]', temp_video_path)
-            
-            # Загрузка аудио потока
-            self._download_stream(url, 'bestaudio', temp_audio_path)
-            
-            # Поиск фактических файлов с их оригинальными расширениями
-            video_pattern = os.path.join(self.temp_dir, f"{video_id}_video.*")
-            audio_pattern = os.path.join(self.temp_dir, f"{video_id}_audio.*")
-            
-            video_file = self._find_file_by_pattern(video_pattern)
-            audio_file = self._find_file_by_pattern(audio_pattern)
-            
-            if not video_file or not audio_file:
-                raise FileNotFoundError("Could not find downloaded video or audio files")
+            # Потоки не вытесняются из хранилища, пока не закончится склейка
+            with self.stream_store.lease() as lease:
+                # Видео поток; уже загруженный и проверенный поток берется из хранилища потоков
+                video_file = self._fetch_stream(
+                    url, info_dict, video_id, f'bestvideo[height<={resolution}]', "video", lease
+                )
+                if not video_file:
+                    raise Exception("Failed to download video stream")
                 
-            # Объединение видео и аудио
-            merge_success = self._merge_video_audio(video_file, audio_file, output_path)
+                # Аудио поток общий для всех разрешений и аудиопрофилей
+                audio_file = self._fetch_stream(url, info_dict, video_id, 'bestaudio', "audio", lease)
+                if not audio_file:
+                    raise Exception("Failed to download audio stream")
+                    
+                # Объединение видео и аудио
+                with log_stage(self.logger, "merge"):
+                    merge_success = self._merge_video_audio(video_file, audio_file, output_path)
             
             if not merge_success:
                 raise Exception("Failed to merge video and audio")
                 
-            # Формирование URL для доступа к файлу
-            url_path = f"{self.base_url}/{output_filename}"
-            
-            self.logger.info(f"Video download complete: {output_path}")
+            self.logger.info("Video download complete: %s", output_path)
             
-            return {
-                "local_path": output_path,
-                "url": url_path,
-                "title": video_title,
-                "duration": duration
-            }
+            result = self._build_result(output_path, video_id, f"{resolution}p", video_title, duration)
+            if sidecar_futures:
+                result["sidecars"] = self.sidecar_fetcher.collect(sidecar_futures)
+            return result
             
         except Exception as e:
-            self.logger.error(f"Error downloading video from {url}: {e}")
+            self.logger.error("Error downloading video from %s: %s", url, e)
             return None
 
-    def download_audio(self, url, convert_to_mp3=False):
+    def download_audio(self, url, convert_to_mp3=False, profile=None, sidecars=None):
         """
         Загружает только аудио с YouTube.
 
         Args:
             url (str): URL видео на YouTube.
-            convert_to_mp3 (bool): Конвертировать в MP3 формат.
+            convert_to_mp3 (bool): Конвертировать в MP3 формат (профиль 'mp3').
+            profile (dict, optional): Профиль перекодирования из Transcoder.resolve.
+            sidecars (dict, optional): Параметры обложки, субтитров и глав.
 
         Returns:
             dict: Информация о загруженном файле или None в случае ошибки.
@@ -366,15 +644,29 @@ class YouTubeDownloader:
                     "duration": "длительность в секундах"
                 }
         """
-        self.logger.info(f"Request to download audio: {url}, convert_to_mp3={convert_to_mp3}")
+        self.logger.info("Request to download audio: %s, convert_to_mp3=%s", url, convert_to_mp3)
+        
+        if convert_to_mp3 and profile is None:
+            profile = self.transcoder.resolve("mp3")
         
-        if not self._validate_youtube_url(url):
-            self.logger.error(f"Invalid YouTube URL: {url}")
+        suffix = self.transcoder.variant(profile) if profile else "audio"
+        
+        # Проверка готового результата до обращения к YouTube
+        cached = self.find_cached(url, suffix)
+        if cached:
+            return self.attach_sidecars(cached, url, sidecars)
+        
+        with log_stage(self.logger, "validate"):
+            valid = self._validate_youtube_url(url)
+            
+        if not valid:
+            self.logger.error("Invalid YouTube URL: %s", url)
             return None
             
         try:
             # Получение информации о видео
-            info_dict = self._get_video_info(url)
+            with log_stage(self.logger, "video_info"):
+                info_dict = self._get_video_info(url)
             if not info_dict:
                 return None
                 
@@ -382,71 +674,44 @@ class YouTubeDownloader:
             video_id = self._get_video_id(url)
             duration = info_dict.get('duration', 0)
             
-            # Формирование имени файла
-            ext = ".mp3" if convert_to_mp3 else ".m4a"
-            suffix = "mp3" if convert_to_mp3 else "audio"
-            output_filename = self._generate_output_filename(video_title, video_id, suffix, ext)
-            output_path = os.path.join(self.download_dir, output_filename)
-            
-            # Опции для скачивания
-            format_code = 'bestaudio'
+            # Сопутствующие файлы загружаются параллельно с медиапотоками
+            sidecar_futures = self.sidecar_fetcher.submit(video_id, sidecars, info_dict) if sidecars else None
             
-            if convert_to_mp3:
-                self.logger.info("Starting audio download with MP3 conversion")
-                
-                # Сначала скачиваем аудио во временный файл с маской для расширения
-                temp_audio_filename = f"{video_id}_audio.%(ext)s"
-                temp_audio_path = os.path.join(self.temp_dir, temp_audio_filename)
-                
-                self._download_stream(url, format_code, temp_audio_path)
-                
-                # Находим фактический файл с оригинальным расширением
-                audio_pattern = os.path.join(self.temp_dir, f"{video_id}_audio.*")
-                audio_file = self._find_file_by_pattern(audio_pattern)
-                
+            # Поток не вытесняется из хранилища, пока не закончится перекодирование
+            with self.stream_store.lease() as lease:
+                # Исходный аудио поток общий для всех профилей и разрешений видео
+                audio_file = self._fetch_stream(url, info_dict, video_id, 'bestaudio', "audio", lease)
                 if not audio_file:
-                    raise FileNotFoundError("Could not find downloaded audio file")
+                    raise Exception("Failed to download audio stream")
                 
-                # Конвертируем в MP3
-                self.logger.info("Converting audio to MP3")
+                # Формирование имени файла; без профиля сохраняется расширение исходного потока
+                ext = self.transcoder.extension(profile) if profile else os.path.splitext(audio_file)[1]
+                output_filename = self._generate_output_filename(video_title, video_id, suffix, ext)
+                output_path = os.path.join(self.download_dir, output_filename)
                 
-                try:
-                    ffmpeg.input(audio_file).output(output_path, format='mp3', acodec='libmp3lame', loglevel='quiet').run(overwrite_output=True)
-                    
-                    # Удаляем временный файл
-                    os.remove(audio_file)
+                if profile:
+                    self.logger.info("Starting audio transcoding with profile %s", profile['name'])
                     
-                    self.logger.info("Audio converted to MP3 successfully")
-                except Exception as e:
-                    self.logger.error(f"Error converting to MP3: {e}")
-                    return None
-            else:
-                # Прямая загрузка аудио без конвертации
-                self._download_stream(url, format_code, output_path)
-                
-                # Находим фактический файл в случае, если yt-dlp добавил расширение
-                output_pattern = f"{os.path.splitext(output_path)[0]}.*"
-                actual_file = self._find_file_by_pattern(output_pattern)
-                
-                if actual_file:
-                    output_path = actual_file
+                    # Перекодируем по профилю; исходный поток остается в хранилище потоков
+                    try:
+                        with log_stage(self.logger, "transcode"):
+                            self.transcoder.transcode(audio_file, output_path, profile, duration)
+                        
+                        self.logger.info("Audio transcoded to %s successfully", suffix)
+                    except Exception as e:
+                        self.logger.error("Error transcoding audio to %s: %s", suffix, e)
+                        return None
                 else:
-                    self.logger.warning(f"Could not find output audio file")
-                    return None
-            
-            # Получаем только имя файла для URL
-            filename = os.path.basename(output_path)
-            url_path = f"{self.base_url}/{filename}"
+                    # Без конвертации результат - жесткая ссылка на исходный поток
+                    self.stream_store.export(audio_file, output_path)
             
-            self.logger.info(f"Audio download complete: {output_path}")
+            self.logger.info("Audio download complete: %s", output_path)
             
-            return {
-                "local_path": output_path,
-                "url": url_path,
-                "title": video_title,
-                "duration": duration
-            }
+            result = self._build_result(output_path, video_id, suffix, video_title, duration)
+            if sidecar_futures:
+                result["sidecars"] = self.sidecar_fetcher.collect(sidecar_futures)
+            return result
             
         except Exception as e:
-            self.logger.error(f"Error downloading audio from {url}: {e}")
+            self.logger.error("Error downloading audio from %s: %s", url, e)
             return None
\ No newline at end of file
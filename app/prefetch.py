@@ -0,0 +1,142 @@
+"""
+Фоновая предзагрузка новых видео с отслеживаемых каналов и плейлистов.
+Новые загрузки ставятся в очередь с фоновым приоритетом, чтобы первый запрос
+пользователя сразу попадал в кэш результатов.
+"""
+
+import logging
+import threading
+from datetime import datetime
+
+from app.scheduler import PRIORITY_BACKGROUND
+
+
+# Идентификатор клиента для справедливой очереди
+PREFETCH_CLIENT = "prefetch"
+
+
+class Prefetcher:
+    """Периодическая проверка источников и предзагрузка новых видео."""
+
+    def __init__(self, downloader, scheduler, circuit_breaker, config):
+        """
+        Инициализация предзагрузки.
+
+        Args:
+            downloader (YouTubeDownloader): Загрузчик.
+            scheduler (DownloadScheduler): Планировщик загрузок.
+            circuit_breaker (CircuitBreaker): Выключатель по ошибкам экстрактора.
+            config (dict): Секция prefetch конфигурации.
+        """
+        self.downloader = downloader
+        self.scheduler = scheduler
+        self.circuit_breaker = circuit_breaker
+        self.interval = config.get("interval_minutes", 60) * 60
+        self.active_hours = config.get("active_hours")
+        self.sources = config.get("sources", [])
+
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """Запуск фонового потока предзагрузки."""
+        if self._thread is not None or not self.sources:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+        self.logger.info("Prefetch started for %s sources", len(self.sources))
+
+    def stop(self):
+        """Остановка фонового потока."""
+        self._stop.set()
+
+    def _in_active_hours(self):
+        """Проверка, что текущий час попадает в окно предзагрузки [start, end)."""
+        if not self.active_hours:
+            return True
+
+        start, end = self.active_hours
+        hour = datetime.now().hour
+        if start <= end:
+            return start <= hour < end
+        # Окно через полночь, например [22, 6]
+        return hour >= start or hour < end
+
+    def _run(self):
+        """Основной цикл: проверка источников с заданным интервалом."""
+        while not self._stop.is_set():
+            if self._in_active_hours() and self.circuit_breaker.state == self.circuit_breaker.CLOSED:
+                for source in self.sources:
+                    try:
+                        self.check_source(source)
+                    except Exception as e:
+                        self.logger.error("Error checking prefetch source %s: %s", source.get("url"), e)
+
+            self._stop.wait(self.interval)
+
+    def _job(self, url, source):
+        """
+        Функция загрузки для планировщика; использует обычные пути YouTubeDownloader.
+
+        Args:
+            url (str): URL видео.
+            source (dict): Настройки источника.
+        """
+        try:
+            # Выключатель мог разомкнуться, пока задача ждала простоя
+            if not self.circuit_breaker.allow_request():
+                self.logger.info("Skipping prefetch of %s: circuit breaker is open", url)
+                return None
+
+            if source.get("mode", "video") == "audio":
+                profile = source.get("profile")
+                transcode_profile = self.downloader.transcoder.resolve(profile) if profile else None
+                return self.downloader.download_audio(url, profile=transcode_profile)
+            return self.downloader.download_video(url, source.get("resolution", 720))
+        finally:
+            with self._lock:
+                self._queued.discard(url)
+
+    def _suffix(self, source):
+        """Вариант результата источника для проверки кэша."""
+        if source.get("mode", "video") == "audio":
+            profile = source.get("profile")
+            if profile:
+                return self.downloader.transcoder.variant(self.downloader.transcoder.resolve(profile))
+            return "audio"
+        return f"{source.get('resolution', 720)}p"
+
+    def check_source(self, source):
+        """
+        Проверка одного источника и постановка новых видео в очередь.
+
+        Args:
+            source (dict): Настройки источника: url, mode ('video'/'audio'),
+                resolution, profile, max_items.
+
+        Returns:
+            int: Количество поставленных в очередь видео.
+        """
+        suffix = self._suffix(source)
+        urls = self.downloader.list_playlist(source["url"], source.get("max_items", 10))
+        queued = 0
+
+        for url in urls:
+            if self.downloader.find_cached(url, suffix):
+                continue
+
+            with self._lock:
+                if url in self._queued:
+                    continue
+                self._queued.add(url)
+
+            self.scheduler.submit(lambda url=url: self._job(url, source), PREFETCH_CLIENT, PRIORITY_BACKGROUND)
+            queued += 1
+
+        if queued:
+            self.logger.info("Prefetch queued %s new items from %s", queued, source["url"])
+        return queued
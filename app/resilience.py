@@ -0,0 +1,217 @@
+"""
+Классификация ошибок экстрактора, повторные попытки с экспоненциальной задержкой
+и автоматический выключатель (circuit breaker) для защиты от волн ограничений YouTube.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+
+# Классы ошибок
+ERROR_TRANSIENT = "transient"
+ERROR_FORMAT = "format"
+ERROR_PERMANENT = "permanent"
+
+# Признаки ошибок, повтор которых бесполезен
+PERMANENT_MARKERS = (
+    "video unavailable",
+    "private video",
+    "is not available",
+    "has been removed",
+    "copyright",
+    "members-only",
+    "sign in to confirm your age",
+    "unsupported url",
+    "requested format is not available",
+)
+
+# Признаки недействительной ссылки на конкретный формат
+FORMAT_MARKERS = (
+    "http error 403",
+    "http error 404",
+    "http error 410",
+)
+
+
+def classify_error(error):
+    """
+    Определение класса ошибки загрузки.
+
+    Args:
+        error (Exception): Ошибка yt-dlp или сети.
+
+    Returns:
+        str: ERROR_PERMANENT, ERROR_FORMAT или ERROR_TRANSIENT.
+    """
+    message = str(error).lower()
+
+    if any(marker in message for marker in PERMANENT_MARKERS):
+        return ERROR_PERMANENT
+    if any(marker in message for marker in FORMAT_MARKERS):
+        return ERROR_FORMAT
+
+    # Таймауты, обрывы соединения, 429 и 5xx считаются временными
+    return ERROR_TRANSIENT
+
+
+class CircuitOpenError(RuntimeError):
+    """Задача отклонена разомкнутым выключателем до обращения к экстрактору."""
+
+
+class RetryPolicy:
+    """Политика повторных попыток с экспоненциальной задержкой и случайным разбросом."""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0):
+        """
+        Инициализация политики.
+
+        Args:
+            max_attempts (int): Максимальное количество попыток.
+            base_delay (float): Задержка перед второй попыткой в секундах.
+            max_delay (float): Верхняя граница задержки в секундах.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """
+        Задержка перед следующей попыткой ("full jitter").
+
+        Args:
+            attempt (int): Номер неудачной попытки, начиная с 1.
+
+        Returns:
+            float: Задержка в секундах.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель по доле ошибок экстрактора в скользящем окне.
+    В открытом состоянии новые задачи сразу отклоняются, после паузы
+    пропускается одна пробная задача.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, window_seconds=60, min_requests=10, failure_ratio=0.5, cooldown_seconds=30):
+        """
+        Инициализация выключателя.
+
+        Args:
+            window_seconds (float): Длина окна наблюдения в секундах.
+            min_requests (int): Минимум вызовов в окне для срабатывания.
+            failure_ratio (float): Доля ошибок, при которой выключатель размыкается.
+            cooldown_seconds (float): Пауза перед пробной задачей.
+        """
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_ratio = failure_ratio
+        self.cooldown_seconds = cooldown_seconds
+
+        self.state = self.CLOSED
+        self._events = deque()
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def _trim(self, now):
+        """Удаление событий за пределами окна."""
+        while self._events and now - self._events[0][0] > self.window_seconds:
+            self._events.popleft()
+
+    def _open(self, now):
+        """Размыкание выключателя."""
+        self.state = self.OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self.logger.warning("Circuit breaker opened for %ss", self.cooldown_seconds)
+
+    def accepting(self):
+        """
+        Проверка при постановке задачи в очередь; в отличие от allow_request
+        не занимает пробную задачу, которая достанется задаче при запуске.
+
+        Returns:
+            bool: False, если выключатель разомкнут или пробная задача уже выполняется.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            if self.state == self.OPEN:
+                return now - self._opened_at >= self.cooldown_seconds
+            if self.state == self.HALF_OPEN:
+                return self._probe_started is None or now - self._probe_started >= self.cooldown_seconds
+            return True
+
+    def allow_request(self):
+        """
+        Проверка, можно ли начать задачу.
+
+        Returns:
+            bool: True, если задачу можно выполнять.
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            if self.state == self.OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.OPEN:
+                return False
+
+            if self.state == self.HALF_OPEN:
+                # Одна пробная задача; зависшая проба не блокирует выключатель навсегда
+                if self._probe_started is not None and now - self._probe_started < self.cooldown_seconds:
+                    return False
+                self._probe_started = now
+
+            return True
+
+    def retry_after(self):
+        """
+        Время до следующей пробной задачи.
+
+        Returns:
+            int: Количество секунд.
+        """
+        with self._lock:
+            remaining = self.cooldown_seconds - (time.monotonic() - self._opened_at)
+        return max(int(remaining) + 1, 1)
+
+    def record_success(self):
+        """Учет успешного обращения к экстрактору."""
+        now = time.monotonic()
+
+        with self._lock:
+            if self.state != self.CLOSED:
+                self.logger.info("Circuit breaker closed")
+                self.state = self.CLOSED
+                self._events.clear()
+            self._events.append((now, True))
+            self._trim(now)
+
+    def record_failure(self):
+        """Учет ошибки экстрактора."""
+        now = time.monotonic()
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open(now)
+                return
+
+            self._events.append((now, False))
+            self._trim(now)
+
+            if self.state == self.CLOSED and len(self._events) >= self.min_requests:
+                failures = sum(1 for _, ok in self._events if not ok)
+                if failures / len(self._events) >= self.failure_ratio:
+                    self._open(now)
@@ -24,6 +24,8 @@ class Routes:
         self.app = app
         self.config = config
         self.video_service = VideoService(config)
+        # Заголовку X-API-Key доверяем только для выданных ключей
+        self.api_keys = set(config["api"].get("api_keys", []))
         self.logger = logging.getLogger(__name__)
 
     def register_routes(self):
@@ -33,12 +35,16 @@ class Routes:
         
         # Системные маршруты
         self.app.route('/health')(self.health)
+        self.app.route('/ready')(self.ready)
         self.app.route('/config')(self.get_config)
         
         # Маршруты API
         self.app.route('/v1/youtube/download', methods=['GET', 'POST'])(self.download_video)
         self.app.route('/v1/youtube/download/audio', methods=['GET', 'POST'])(self.download_audio)
         self.app.route('/v1/youtube/download/audio/mp3', methods=['GET', 'POST'])(self.download_audio_mp3)
+        self.app.route('/v1/youtube/download/audio/<profile>', methods=['GET', 'POST'])(self.download_audio_profile)
+        self.app.route('/v1/queue')(self.queue_status)
+        self.app.route('/v1/jobs/<job_id>')(self.job_status)
         
         self.logger.info("Routes registered")
 
@@ -64,6 +70,16 @@ class Routes:
             "service": "youtube-downloader-api"
         })
 
+    def ready(self):
+        """
+        Проверка готовности к загрузкам (зависимости загружены, сессии созданы).
+
+        Returns:
+            JSON: Состояние прогрева; 503, пока сервис не готов.
+        """
+        status = self.video_service.warmup.status()
+        return jsonify(status), 200 if status["ready"] else 503
+
     def get_config(self):
         """
         Получение текущей конфигурации сервиса (без секретных данных).
@@ -88,20 +104,93 @@ class Routes:
         
         return jsonify(safe_config)
 
-    def _get_url_from_request(self):
+    def _get_param_from_request(self, name):
         """
-        Извлекает URL из запроса (GET или POST).
+        Извлекает параметр из запроса (GET или POST).
+
+        Args:
+            name (str): Имя параметра.
 
         Returns:
-            str: URL видео или None, если URL не найден.
+            str: Значение параметра или None, если параметр не найден.
         """
         if request.method == 'GET':
-            return request.args.get('url')
+            return request.args.get(name)
         else:  # POST
             if request.is_json:
-                return request.json.get('url')
+                return request.json.get(name)
             else:
-                return request.form.get('url')
+                return request.form.get(name)
+
+    def _get_url_from_request(self):
+        """
+        Извлекает URL из запроса (GET или POST).
+
+        Returns:
+            str: URL видео или None, если URL не найден.
+        """
+        return self._get_param_from_request('url')
+
+    def _get_sidecar_params(self):
+        """
+        Извлекает параметры сопутствующих файлов (обложка, субтитры, главы).
+
+        Returns:
+            dict: Параметры thumbnail, subtitles и chapters.
+        """
+        return {
+            "thumbnail": self._get_param_from_request('thumbnail'),
+            "subtitles": self._get_param_from_request('subtitles'),
+            "chapters": self._get_param_from_request('chapters')
+        }
+
+    def _respond_async(self):
+        """
+        Запрошен ли асинхронный ответ: параметр async=true или заголовок Prefer: respond-async.
+
+        Returns:
+            bool: True, если клиент будет опрашивать задачу по job_id.
+        """
+        if "respond-async" in request.headers.get('Prefer', ''):
+            return True
+        return str(self._get_param_from_request('async')).lower() in ("1", "true", "yes", "on")
+
+    def _get_client_id(self):
+        """
+        Идентификатор клиента для справедливого разделения очереди.
+
+        Произвольный ключ позволял бы обходить справедливую очередь новым ключом
+        в каждом запросе, поэтому неизвестные ключи игнорируются.
+
+        Returns:
+            str: Выданный API-ключ из заголовка X-API-Key или IP-адрес клиента.
+        """
+        api_key = request.headers.get('X-API-Key')
+        if api_key and api_key in self.api_keys:
+            return api_key
+        return request.remote_addr or "anonymous"
+
+    def queue_status(self):
+        """
+        Состояние очереди загрузок для текущего клиента.
+
+        Returns:
+            JSON: Позиции задач клиента и оценка времени их запуска.
+        """
+        return jsonify(self.video_service.queue_status(self._get_client_id()))
+
+    def job_status(self, job_id):
+        """
+        Состояние поставленной в очередь загрузки.
+
+        Args:
+            job_id (str): ID задачи из ответа 202.
+
+        Returns:
+            JSON: 202 пока загрузка не завершена, затем результат скачивания.
+        """
+        result, status_code = self.video_service.job_status(job_id, self._get_client_id())
+        return jsonify(result), status_code
 
     def download_video(self):
         """
@@ -113,17 +202,16 @@ class Routes:
         url = self._get_url_from_request()
         
         # Получение разрешения из запроса
-        resolution = None
-        if request.method == 'GET':
-            resolution = request.args.get('resolution')
-        else:  # POST
-            if request.is_json:
-                resolution = request.json.get('resolution')
-            else:
-                resolution = request.form.get('resolution')
+        resolution = self._get_param_from_request('resolution')
                 
         # Скачивание видео
-        result, status_code = self.video_service.download_video(url, resolution)
+        result, status_code = self.video_service.download_video(
+            url, resolution,
+            client=self._get_client_id(),
+            priority=self._get_param_from_request('priority'),
+            sidecars=self._get_sidecar_params(),
+            respond_async=self._respond_async()
+        )
         
         return jsonify(result), status_code
 
@@ -137,7 +225,13 @@ class Routes:
         url = self._get_url_from_request()
         
         # Скачивание аудио
-        result, status_code = self.video_service.download_audio(url, convert_to_mp3=False)
+        result, status_code = self.video_service.download_audio(
+            url, convert_to_mp3=False,
+            client=self._get_client_id(),
+            priority=self._get_param_from_request('priority'),
+            sidecars=self._get_sidecar_params(),
+            respond_async=self._respond_async()
+        )
         
         return jsonify(result), status_code
 
@@ -151,6 +245,40 @@ class Routes:
         url = self._get_url_from_request()
         
         # Скачивание аудио и конвертация в MP3
-        result, status_code = self.video_service.download_audio(url, convert_to_mp3=True)
+        result, status_code = self.video_service.download_audio(
+            url, convert_to_mp3=True,
+            client=self._get_client_id(),
+            priority=self._get_param_from_request('priority'),
+            bitrate=self._get_param_from_request('bitrate'),
+            mode=self._get_param_from_request('mode'),
+            sidecars=self._get_sidecar_params(),
+            respond_async=self._respond_async()
+        )
+        
+        return jsonify(result), status_code
+
+    def download_audio_profile(self, profile):
+        """
+        Маршрут для скачивания аудио с перекодированием по профилю (opus, aac, mp3-vbr и т.д.).
+
+        Args:
+            profile (str): Имя профиля перекодирования.
+
+        Returns:
+            JSON: Результат скачивания.
+        """
+        url = self._get_url_from_request()
+        
+        # Скачивание аудио и перекодирование по профилю
+        result, status_code = self.video_service.download_audio(
+            url,
+            client=self._get_client_id(),
+            priority=self._get_param_from_request('priority'),
+            profile=profile,
+            bitrate=self._get_param_from_request('bitrate'),
+            mode=self._get_param_from_request('mode'),
+            sidecars=self._get_sidecar_params(),
+            respond_async=self._respond_async()
+        )
         
         return jsonify(result), status_code
\ No newline at end of file
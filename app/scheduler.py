@@ -0,0 +1,279 @@
+"""
+Планировщик загрузок с классами приоритета и справедливым разделением между клиентами.
+Задачи выполняются фиксированным числом рабочих потоков; поток Waitress ждет
+результат своей задачи или, по запросу клиента, сразу отдает job_id для опроса.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+
+# Классы приоритета: меньшее значение выполняется раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_INTERACTIVE_HEAVY = 1
+PRIORITY_BATCH = 2
+# Фоновые задачи (предзагрузка) не повышаются со временем и выполняются при простое
+PRIORITY_BACKGROUND = 3
+
+# Состояния задачи
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_INTERACTIVE_HEAVY: "interactive-heavy",
+    PRIORITY_BATCH: "batch",
+    PRIORITY_BACKGROUND: "background"
+}
+
+
+class Job:
+    """Задача на загрузку, ожидающая выполнения в планировщике."""
+
+    def __init__(self, func, client, priority, cost):
+        """
+        Инициализация задачи.
+
+        Args:
+            func (callable): Функция, выполняющая загрузку.
+            client (str): Идентификатор клиента (API-ключ или IP-адрес).
+            priority (int): Класс приоритета.
+            cost (float): Относительная стоимость задачи.
+        """
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.client = client
+        self.priority = priority
+        self.cost = cost
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self.state = JOB_QUEUED
+        self.virtual_start = 0.0
+        self.virtual_finish = 0.0
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+        # Контекст вызывающего потока (trace ID) переносится в рабочий поток
+        self.context = contextvars.copy_context()
+
+
+class DownloadScheduler:
+    """
+    Планировщик с классами приоритета и взвешенной справедливой очередью (WFQ) по клиентам.
+    Долго ожидающие задачи постепенно повышают свой класс, поэтому никто не голодает.
+    """
+
+    def __init__(self, workers=4, aging_seconds=60, client_weights=None, result_ttl=600, background_workers=1):
+        """
+        Инициализация планировщика.
+
+        Args:
+            workers (int): Количество одновременно выполняемых загрузок.
+            aging_seconds (float): Время ожидания, за которое задача поднимается на один класс.
+            client_weights (dict, optional): Веса клиентов для справедливого разделения.
+            result_ttl (float): Сколько секунд хранится результат завершенной задачи для опроса.
+            background_workers (int): Максимум одновременно выполняемых фоновых задач;
+                остальные рабочие потоки всегда свободны для пользовательских загрузок.
+        """
+        self.workers = workers
+        self.aging_seconds = aging_seconds
+        self.client_weights = client_weights or {}
+        self.result_ttl = result_ttl
+        self.background_workers = min(background_workers, max(workers - 1, 0))
+
+        self._pending = []
+        self._running = 0
+        self._running_background = 0
+        self._virtual_time = 0.0
+        self._client_finish = {}
+        # Незавершенные задачи клиента; состояние WFQ клиента удаляется, когда их не остается
+        self._client_outstanding = {}
+        self._jobs = {}
+        self._durations = {}
+        self._condition = threading.Condition()
+        self.logger = logging.getLogger(__name__)
+
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"download-worker-{i}", daemon=True).start()
+
+    def _sort_key(self, job, now):
+        """Ключ выбора задачи: класс с учетом ожидания, затем виртуальное время клиента."""
+        if job.priority == PRIORITY_BACKGROUND:
+            return (job.priority, job.virtual_finish)
+
+        waited = now - job.submitted_at
+        effective_priority = job.priority - waited / self.aging_seconds if self.aging_seconds else job.priority
+        return (max(effective_priority, 0), job.virtual_finish)
+
+    def _ordered(self, now):
+        """Ожидающие задачи в порядке выполнения."""
+        return sorted(self._pending, key=lambda job: self._sort_key(job, now))
+
+    def _next_job(self, now):
+        """Следующая задача с учетом лимита фоновых задач или None."""
+        for job in self._ordered(now):
+            if job.priority == PRIORITY_BACKGROUND and self._running_background >= self.background_workers:
+                continue
+            return job
+        return None
+
+    def _average_duration(self, priority):
+        """Средняя длительность задач класса (скользящее среднее)."""
+        history = self._durations.get(priority)
+        if not history:
+            return 60.0
+        return sum(history) / len(history)
+
+    def submit(self, func, client, priority, cost=1.0, max_outstanding=0):
+        """
+        Постановка задачи в очередь.
+
+        Args:
+            func (callable): Функция, выполняющая загрузку.
+            client (str): Идентификатор клиента.
+            priority (int): Класс приоритета.
+            cost (float): Относительная стоимость задачи.
+            max_outstanding (int): Максимум незавершенных задач клиента (0 - без лимита).
+
+        Returns:
+            Job: Поставленная в очередь задача или None, если лимит клиента исчерпан.
+        """
+        job = Job(func, client, priority, cost)
+        weight = self.client_weights.get(client, 1)
+
+        with self._condition:
+            # Проверка лимита под той же блокировкой, что и постановка, иначе параллельные запросы его превысят
+            if max_outstanding and self._client_outstanding.get(client, 0) >= max_outstanding:
+                return None
+
+            self._expire(job.submitted_at)
+            job.virtual_start = max(self._virtual_time, self._client_finish.get(client, 0.0))
+            job.virtual_finish = job.virtual_start + cost / weight
+            self._client_finish[client] = job.virtual_finish
+            self._client_outstanding[client] = self._client_outstanding.get(client, 0) + 1
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._condition.notify()
+
+        self.logger.info("Job %s queued for %s (%s, cost=%g)", job.id, client, PRIORITY_NAMES[priority], cost,
+                         extra={"job_id": job.id, "sampled": True})
+        return job
+
+    def _expire(self, now):
+        """Удаление завершенных задач, результат которых хранится дольше result_ttl."""
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """
+        Поиск задачи по ID.
+
+        Args:
+            job_id (str): ID задачи.
+
+        Returns:
+            Job: Задача или None, если она не найдена или ее результат устарел.
+        """
+        with self._condition:
+            self._expire(time.monotonic())
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        """Рабочий поток: выбирает следующую задачу и выполняет ее."""
+        while True:
+            with self._condition:
+                job = None
+                while job is None:
+                    job = self._next_job(time.monotonic())
+                    if job is None:
+                        self._condition.wait()
+
+                self._pending.remove(job)
+                self._virtual_time = max(self._virtual_time, job.virtual_start)
+                self._running += 1
+                if job.priority == PRIORITY_BACKGROUND:
+                    self._running_background += 1
+                job.state = JOB_RUNNING
+
+            started_at = time.monotonic()
+            try:
+                job.result = job.context.run(job.func)
+                job.state = JOB_DONE
+            except Exception as e:
+                self.logger.error("Job %s failed: %s", job.id, e)
+                job.error = e
+                job.state = JOB_FAILED
+            finally:
+                job.finished_at = time.monotonic()
+                duration = job.finished_at - started_at
+                with self._condition:
+                    self._running -= 1
+                    if job.priority == PRIORITY_BACKGROUND:
+                        self._running_background -= 1
+                        # Свободный слот фоновой задачи может ждать другой рабочий поток
+                        self._condition.notify()
+                    self._durations.setdefault(job.priority, deque(maxlen=20)).append(duration)
+
+                    outstanding = self._client_outstanding[job.client] - 1
+                    if outstanding:
+                        self._client_outstanding[job.client] = outstanding
+                    else:
+                        del self._client_outstanding[job.client]
+                        del self._client_finish[job.client]
+                job.done.set()
+
+    def queue_status(self, client=None):
+        """
+        Позиции задач в очереди и оценка времени их запуска.
+
+        Args:
+            client (str, optional): Вернуть только задачи этого клиента.
+
+        Returns:
+            dict: Состояние очереди.
+        """
+        now = time.monotonic()
+
+        with self._condition:
+            ordered = self._ordered(now)
+            running = self._running
+
+            # Оценка: выполняющиеся задачи в среднем завершены наполовину,
+            # задачи впереди распределяются по освобождающимся рабочим потокам
+            busy = min(running, self.workers)
+            remaining = self._average_duration(PRIORITY_INTERACTIVE) / 2
+            busy_until = [remaining] * busy + [0.0] * (self.workers - busy)
+
+            jobs = []
+            for position, job in enumerate(ordered):
+                slot = busy_until.index(min(busy_until))
+                estimated_start = busy_until[slot]
+                busy_until[slot] += self._average_duration(job.priority)
+
+                if client is not None and job.client != client:
+                    continue
+
+                jobs.append({
+                    "job_id": job.id,
+                    "position": position + 1,
+                    "priority": PRIORITY_NAMES[job.priority],
+                    "waiting_seconds": round(now - job.submitted_at, 1),
+                    "estimated_start_seconds": round(estimated_start, 1)
+                })
+
+        return {
+            "workers": self.workers,
+            "running": running,
+            "queued": len(ordered),
+            "jobs": jobs
+        }
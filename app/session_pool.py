@@ -0,0 +1,153 @@
+"""
+Пул переиспользуемых сессий YoutubeDL.
+Сохраняет между запросами инициализированные экстракторы, cookie, HTTP-соединения
+и кэш player JS/сигнатур, чтобы не платить за них при каждом обращении к YouTube.
+"""
+
+import json
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class YoutubeDLPool:
+    """Потокобезопасный пул экземпляров YoutubeDL, сгруппированных по профилю опций."""
+
+    def __init__(self, max_uses=50, max_idle=4):
+        """
+        Инициализация пула.
+
+        Args:
+            max_uses (int): Количество использований, после которого сессия пересоздается.
+            max_idle (int): Максимум свободных сессий на один профиль опций.
+        """
+        self.max_uses = max_uses
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _profile_key(options):
+        """Ключ профиля: одинаковые опции используют одни и те же сессии."""
+        return json.dumps(options, sort_keys=True, default=str)
+
+    @staticmethod
+    def _apply_overrides(ydl, overrides):
+        """
+        Применение опций конкретного запроса к сессии из пула.
+
+        Args:
+            ydl (YoutubeDL): Сессия.
+            overrides (dict): Опции запроса ('format', 'outtmpl', 'progress_hooks').
+        """
+        if not overrides:
+            return
+
+        # Обработчики прогресса не должны переходить к следующему запросу
+        ydl._progress_hooks = list(overrides.get("progress_hooks", []))
+
+        if "format" in overrides:
+            # Селектор формата строится в конструкторе, поэтому пересобираем его
+            ydl.params["format"] = overrides["format"]
+            ydl.format_selector = ydl.build_format_selector(overrides["format"])
+
+        if "outtmpl" in overrides:
+            ydl.params["outtmpl"] = {"default": overrides["outtmpl"]}
+
+    @staticmethod
+    def _close(ydl):
+        """Закрытие сессии (сохранение cookie и освобождение соединений)."""
+        try:
+            ydl.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def _acquire(self, key, options):
+        """Получение свободной сессии профиля или создание новой."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+
+        return self._create(options)
+
+    @staticmethod
+    def _create(options):
+        """Создание новой сессии."""
+        # yt_dlp с реестром экстракторов загружается при первой сессии, а не при импорте модуля
+        from yt_dlp import YoutubeDL
+        return [YoutubeDL(dict(options)), 0]
+
+    def prewarm(self, options, count=1):
+        """
+        Создание свободных сессий профиля заранее, до первого запроса.
+
+        Args:
+            options (dict): Опции профиля.
+            count (int): Количество сессий (не больше max_idle).
+        """
+        key = self._profile_key(options)
+        with self._lock:
+            missing = min(count, self.max_idle) - len(self._idle.get(key, []))
+
+        for _ in range(missing):
+            entry = self._create(options)
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(entry)
+                    continue
+            self._close(entry[0])
+
+    def _release(self, key, entry, failed):
+        """Возврат сессии в пул или ее утилизация."""
+        entry[1] += 1
+
+        if failed or entry[1] >= self.max_uses:
+            self.logger.debug("Recycling YoutubeDL session after %s uses (failed=%s)", entry[1], failed)
+            self._close(entry[0])
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(entry)
+                return
+
+        self._close(entry[0])
+
+    @contextmanager
+    def session(self, options, overrides=None):
+        """
+        Контекстный менеджер для работы с сессией YoutubeDL из пула.
+
+        Args:
+            options (dict): Постоянные опции профиля.
+            overrides (dict, optional): Опции конкретного запроса.
+
+        Yields:
+            YoutubeDL: Сессия, закрепленная за текущим потоком до выхода из контекста.
+        """
+        key = self._profile_key(options)
+        entry = self._acquire(key, options)
+        failed = False
+
+        try:
+            self._apply_overrides(entry[0], overrides)
+            yield entry[0]
+        except Exception:
+            # После ошибки состояние сессии не гарантировано
+            failed = True
+            raise
+        finally:
+            self._release(key, entry, failed)
+
+    def close(self):
+        """Закрытие всех свободных сессий."""
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+
+        for entry in entries:
+            self._close(entry[0])
@@ -0,0 +1,333 @@
+"""
+Сопутствующие файлы к загрузке: уменьшенная обложка, субтитры в VTT и главы в JSON.
+Ссылки берутся из уже полученного info_dict, файлы загружаются через общий пул
+HTTP-соединений и кэшируются рядом с результатом.
+"""
+
+import os
+import re
+import json
+import logging
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.storage import temp_path, remove_quietly
+
+# ffmpeg и requests импортируются при первом обращении, чтобы не замедлять старт сервиса
+
+
+# Предпочтительные форматы субтитров: VTT без конвертации, затем форматы, которые понимает ffmpeg
+SUBTITLE_FORMATS = ("vtt", "srt", "ass")
+
+
+class SidecarFetcher:
+    """Загрузка и кэширование обложек, субтитров и глав."""
+
+    def __init__(self, download_dir, base_url, storage=None, pool_size=8, timeout=30):
+        """
+        Инициализация загрузчика сопутствующих файлов.
+
+        Args:
+            download_dir (str): Директория результатов (отдается через /media).
+            base_url (str): Базовый URL для доступа к файлам.
+            storage (ResultStorage, optional): Хранилище результатов.
+            pool_size (int): Размер пула HTTP-соединений.
+            timeout (int): Таймаут HTTP-запросов в секундах.
+        """
+        self.download_dir = download_dir
+        self.base_url = base_url
+        self.storage = storage
+        self.timeout = timeout
+        self.pool_size = pool_size
+
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="sidecar")
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def session(self):
+        """Общая HTTP-сессия: соединения с i.ytimg.com и youtube.com переиспользуются."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    @staticmethod
+    def parse_options(thumbnail=None, subtitles=None, chapters=None):
+        """
+        Разбор параметров запроса.
+
+        Args:
+            thumbnail (str, optional): Ширина обложки или 'true' для ширины по умолчанию.
+            subtitles (str | list, optional): Языки субтитров через запятую.
+            chapters (str | bool, optional): Нужны ли главы.
+
+        Returns:
+            dict: Нормализованные параметры или None, если ничего не запрошено.
+
+        Raises:
+            ValueError: Если параметры некорректны.
+        """
+        def is_true(value):
+            return str(value).lower() in ("1", "true", "yes", "on")
+
+        def is_false(value):
+            return value in (None, "", False) or str(value).lower() in ("0", "false", "no", "off")
+
+        options = {"thumbnail_width": None, "subtitles": [], "chapters": False}
+
+        if not is_false(thumbnail):
+            if is_true(thumbnail):
+                options["thumbnail_width"] = 480
+            else:
+                try:
+                    options["thumbnail_width"] = int(thumbnail)
+                except (TypeError, ValueError):
+                    raise ValueError("Thumbnail must be a width in pixels or 'true'")
+                if options["thumbnail_width"] <= 0:
+                    raise ValueError("Thumbnail width must be a positive integer")
+
+        if subtitles:
+            if isinstance(subtitles, str):
+                subtitles = subtitles.split(",")
+            options["subtitles"] = [lang.strip() for lang in subtitles if lang.strip()]
+            # Код языка входит в имя файла, поэтому допускаем только буквы, цифры и дефис
+            for lang in options["subtitles"]:
+                if not re.fullmatch(r"[A-Za-z0-9-]+", lang):
+                    raise ValueError(f"Invalid subtitle language: {lang}")
+
+        if chapters not in (None, ""):
+            options["chapters"] = is_true(chapters)
+
+        if not options["thumbnail_width"] and not options["subtitles"] and not options["chapters"]:
+            return None
+        return options
+
+    @staticmethod
+    def _filenames(video_id, options):
+        """Имена сопутствующих файлов: одинаковые для всех запросов одного видео."""
+        names = {}
+        if options["thumbnail_width"]:
+            names["thumbnail"] = f"{video_id}.thumb{options['thumbnail_width']}.jpg"
+        for lang in options["subtitles"]:
+            names[f"subtitles:{lang}"] = f"{video_id}.{lang}.vtt"
+        if options["chapters"]:
+            names["chapters"] = f"{video_id}.chapters.json"
+        return names
+
+    def _url_for(self, filename):
+        """URL сопутствующего файла."""
+        if self.storage is not None:
+            return self.storage.url_for(filename)
+        return f"{self.base_url}/{filename}"
+
+    def _local(self, filename):
+        """Путь к файлу в кэше или None (с докачкой из общего хранилища)."""
+        if self.storage is not None:
+            return self.storage.ensure_local(filename)
+        path = os.path.join(self.download_dir, filename)
+        return path if os.path.isfile(path) else None
+
+    def _download(self, url, path):
+        """Потоковая загрузка файла по HTTP через общий пул соединений."""
+        tmp_path = temp_path(path)
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(64 * 1024):
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            remove_quietly(tmp_path)
+
+    @staticmethod
+    def _convert(stream, path, **output_args):
+        """Запуск ffmpeg с записью во временный файл и атомарной заменой результата."""
+        tmp_path = temp_path(path, os.path.splitext(path)[1])
+        try:
+            stream.output(tmp_path, loglevel="quiet", **output_args).run(overwrite_output=True)
+            os.replace(tmp_path, path)
+        finally:
+            remove_quietly(tmp_path)
+
+    def _fetch_thumbnail(self, info_dict, path, width):
+        """Загрузка лучшей обложки и уменьшение до заданной ширины."""
+        thumbnails = [t for t in info_dict.get("thumbnails") or [] if t.get("url")]
+        if thumbnails:
+            # Наименьшая обложка не уже нужной ширины, иначе самая большая
+            thumbnails.sort(key=lambda t: t.get("width") or 0)
+            suitable = [t for t in thumbnails if (t.get("width") or 0) >= width]
+            url = suitable[0]["url"] if suitable else thumbnails[-1]["url"]
+        else:
+            url = info_dict.get("thumbnail")
+        if not url:
+            return False
+
+        import ffmpeg
+
+        source_path = temp_path(path, ".source")
+        try:
+            self._download(url, source_path)
+            self._convert(ffmpeg.input(source_path).filter("scale", width, -2), path)
+        finally:
+            remove_quietly(source_path)
+        return True
+
+    def _fetch_subtitles(self, info_dict, path, lang):
+        """Загрузка субтитров языка (сначала ручных, затем автоматических) в формате VTT."""
+        tracks = (info_dict.get("subtitles") or {}).get(lang) or \
+            (info_dict.get("automatic_captions") or {}).get(lang) or []
+
+        for ext in SUBTITLE_FORMATS:
+            track = next((t for t in tracks if t.get("ext") == ext and t.get("url")), None)
+            if not track:
+                continue
+
+            if ext == "vtt":
+                self._download(track["url"], path)
+            else:
+                import ffmpeg
+
+                source_path = temp_path(path, f".{ext}")
+                try:
+                    self._download(track["url"], source_path)
+                    self._convert(ffmpeg.input(source_path), path, format="webvtt")
+                finally:
+                    remove_quietly(source_path)
+            return True
+
+        return False
+
+    @staticmethod
+    def _write_chapters(info_dict, path):
+        """Сохранение глав видео в JSON."""
+        chapters = [
+            {
+                "title": chapter.get("title"),
+                "start_time": chapter.get("start_time"),
+                "end_time": chapter.get("end_time")
+            }
+            for chapter in info_dict.get("chapters") or []
+        ]
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(chapters, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            remove_quietly(tmp_path)
+        return True
+
+    def _fetch_one(self, name, filename, info_dict, options):
+        """Загрузка одного сопутствующего файла; возвращает URL или None."""
+        if self._local(filename):
+            return self._url_for(filename)
+
+        # Без информации о видео главы оказались бы пустым списком, который закэшировался бы навсегда
+        if not info_dict:
+            return None
+
+        path = os.path.join(self.download_dir, filename)
+        try:
+            if name == "thumbnail":
+                ok = self._fetch_thumbnail(info_dict, path, options["thumbnail_width"])
+            elif name == "chapters":
+                ok = self._write_chapters(info_dict, path)
+            else:
+                ok = self._fetch_subtitles(info_dict, path, name.split(":", 1)[1])
+        except Exception as e:
+            self.logger.error("Error fetching %s for %s: %s", name, filename, e)
+            return None
+
+        if not ok:
+            return None
+        if self.storage is not None:
+            self.storage.store_file(path)
+        return self._url_for(filename)
+
+    def submit(self, video_id, options, info_dict):
+        """
+        Запуск загрузки сопутствующих файлов параллельно с загрузкой медиа.
+
+        Args:
+            video_id (str): ID видео.
+            options (dict): Параметры из parse_options.
+            info_dict (dict): Информация о видео.
+
+        Returns:
+            dict: Задачи загрузки по именам файлов; результат получается через collect.
+        """
+        # Каждая задача получает копию контекста, чтобы записи лога несли trace ID запроса
+        return {
+            name: self.executor.submit(
+                contextvars.copy_context().run, self._fetch_one, name, filename, info_dict or {}, options
+            )
+            for name, filename in self._filenames(video_id, options).items()
+        }
+
+    @staticmethod
+    def collect(futures):
+        """
+        Ожидание задач submit.
+
+        Args:
+            futures (dict): Задачи загрузки.
+
+        Returns:
+            dict: {"thumbnail": url, "subtitles": {lang: url}, "chapters": url}
+        """
+        result = {}
+        for name, future in futures.items():
+            url = future.result()
+            if name.startswith("subtitles:"):
+                result.setdefault("subtitles", {})[name.split(":", 1)[1]] = url
+            else:
+                result[name] = url
+        return result
+
+    def cached(self, video_id, options):
+        """
+        Проверка, что все запрошенные сопутствующие файлы уже есть и информация о видео не нужна.
+
+        Args:
+            video_id (str): ID видео.
+            options (dict): Параметры из parse_options.
+
+        Returns:
+            bool: True, если все файлы в кэше.
+        """
+        return all(self._local(filename) for filename in self._filenames(video_id, options).values())
+
+    def fetch(self, video_id, options, info_loader):
+        """
+        Загрузка сопутствующих файлов для уже готового результата.
+        Информация о видео запрашивается, только если какого-то файла нет в кэше.
+
+        Args:
+            video_id (str): ID видео.
+            options (dict): Параметры из parse_options.
+            info_loader (callable): Получение info_dict.
+
+        Returns:
+            dict: {"thumbnail": url, "subtitles": {lang: url}, "chapters": url}
+                или None, если информацию о видео получить не удалось.
+        """
+        if self.cached(video_id, options):
+            info_dict = {}
+        else:
+            info_dict = info_loader()
+            if not info_dict:
+                self.logger.error("Cannot fetch sidecars for %s: video info is unavailable", video_id)
+                return None
+        return self.collect(self.submit(video_id, options, info_dict))
@@ -0,0 +1,467 @@
+"""
+Модуль многоуровневого хранения результатов загрузки.
+Локальный горячий кэш с ограничением по размеру и подключаемое общее хранилище
+(каталог файловой системы/NFS или S3-совместимый API).
+"""
+
+import os
+import json
+import logging
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+
+
+# Размер блока при потоковом копировании файлов
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def temp_path(path, suffix=".part"):
+    """
+    Уникальное имя временного файла рядом с path: одновременные запросы
+    одного файла не пишут и не удаляют чужие временные файлы.
+    Скрытое имя не попадает в вытеснение горячего кэша и не отдается через /media.
+
+    Args:
+        path (str): Итоговый путь файла.
+        suffix (str): Окончание имени (ffmpeg определяет формат по расширению).
+
+    Returns:
+        str: Путь временного файла.
+    """
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}{suffix}")
+
+
+def remove_quietly(path):
+    """Удаление временного файла, если он есть."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FilesystemBackend:
+    """Общее хранилище в каталоге файловой системы (например, смонтированный NFS)."""
+
+    def __init__(self, path):
+        """
+        Инициализация хранилища в каталоге.
+
+        Args:
+            path (str): Путь к общему каталогу.
+        """
+        if not path:
+            raise ValueError("Filesystem storage backend requires 'path'")
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def _path(self, name):
+        """Полный путь к объекту в общем каталоге."""
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _copy(src, dst):
+        """
+        Потоковое копирование файла через временный файл с атомарной заменой.
+
+        Args:
+            src (str): Исходный файл.
+            dst (str): Файл назначения.
+        """
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        tmp_path = temp_path(dst)
+        try:
+            with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+                shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+            os.replace(tmp_path, dst)
+        except Exception:
+            remove_quietly(tmp_path)
+            raise
+
+    def exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def put(self, local_path, name):
+        self._copy(local_path, self._path(name))
+
+    def get(self, name, local_path):
+        self._copy(self._path(name), local_path)
+
+    def put_bytes(self, data, name):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            remove_quietly(tmp_path)
+            raise
+
+    def get_bytes(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def presign(self, name, expires):
+        # Файловое хранилище не умеет выдавать прямые ссылки
+        return None
+
+
+class S3Backend:
+    """Общее хранилище в S3-совместимом API (AWS S3, MinIO и т.п.)."""
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None, multipart_chunk_mb=16):
+        """
+        Инициализация S3-хранилища.
+
+        Args:
+            bucket (str): Имя бакета.
+            prefix (str): Префикс ключей объектов.
+            endpoint_url (str): Адрес S3-совместимого API (для MinIO и локальных заглушек).
+            region (str): Регион.
+            multipart_chunk_mb (int): Размер части при multipart-загрузке в мегабайтах.
+        """
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise ValueError("S3 storage backend requires boto3: pip install boto3")
+
+        if not bucket:
+            raise ValueError("S3 storage backend requires 'bucket'")
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+        self._client_error = ClientError
+
+        # Файлы крупнее одной части загружаются потоково по частям
+        chunk_size = int(multipart_chunk_mb) * 1024 * 1024
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size
+        )
+
+    def _key(self, name):
+        """Ключ объекта с учетом префикса."""
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+            return True
+        except self._client_error:
+            return False
+
+    def put(self, local_path, name):
+        self.client.upload_file(local_path, self.bucket, self._key(name), Config=self.transfer_config)
+
+    def get(self, name, local_path):
+        tmp_path = temp_path(local_path)
+        try:
+            self.client.download_file(self.bucket, self._key(name), tmp_path, Config=self.transfer_config)
+            os.replace(tmp_path, local_path)
+        except Exception:
+            remove_quietly(tmp_path)
+            raise
+
+    def put_bytes(self, data, name):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(name), Body=data)
+
+    def get_bytes(self, name):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+            return response["Body"].read()
+        except self._client_error:
+            return None
+
+    def presign(self, name, expires):
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(name)},
+            ExpiresIn=expires
+        )
+
+
+def create_backend(config):
+    """
+    Создание общего хранилища по секции конфигурации.
+
+    Args:
+        config (dict): Секция storage.shared конфигурации.
+
+    Returns:
+        FilesystemBackend | S3Backend | None: Общее хранилище или None, если оно отключено.
+    """
+    backend_type = (config or {}).get("type", "none")
+
+    if backend_type in (None, "", "none"):
+        return None
+    if backend_type == "filesystem":
+        return FilesystemBackend(config.get("path"))
+    if backend_type == "s3":
+        return S3Backend(
+            bucket=config.get("bucket"),
+            prefix=config.get("prefix", ""),
+            endpoint_url=config.get("endpoint_url"),
+            region=config.get("region"),
+            multipart_chunk_mb=config.get("multipart_chunk_mb", 16)
+        )
+
+    raise ValueError(f"Unknown storage backend type: {backend_type}")
+
+
+class ResultStorage:
+    """
+    Хранилище готовых файлов: локальный горячий кэш в download_dir
+    и необязательное общее хранилище, разделяемое между репликами.
+    """
+
+    INDEX_DIR = ".index"
+
+    def __init__(self, download_dir, base_url, config=None):
+        """
+        Инициализация хранилища результатов.
+
+        Args:
+            download_dir (str): Директория горячего кэша (она же отдается через /media).
+            base_url (str): Базовый URL для доступа к файлам.
+            config (dict, optional): Секция storage конфигурации.
+        """
+        config = config or {}
+
+        self.download_dir = download_dir
+        self.base_url = base_url
+        self.max_size = int(config.get("hot_max_size_mb", 0)) * 1024 * 1024
+        self.url_mode = config.get("url_mode", "proxy")
+        self.presign_expires = int(config.get("presign_expires", 3600))
+        self.shared = create_backend(config.get("shared"))
+
+        self.index_dir = os.path.join(self.download_dir, self.INDEX_DIR)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file_locks = {}
+        self.logger = logging.getLogger(__name__)
+
+    @contextmanager
+    def _file_lock(self, filename):
+        """Блокировка файла: одновременные запросы докачивают его из общего хранилища один раз."""
+        with self._lock:
+            entry = self._file_locks.setdefault(filename, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._file_locks[filename]
+
+    @staticmethod
+    def _cache_key(video_id, suffix):
+        """Ключ результата: один и тот же для всех реплик."""
+        return f"{video_id}_{suffix}"
+
+    def _read_local_meta(self, key):
+        """Чтение метаданных результата из локального индекса."""
+        try:
+            with open(os.path.join(self.index_dir, f"{key}.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_local_meta(self, key, meta):
+        """Запись метаданных результата в локальный индекс."""
+        with open(os.path.join(self.index_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _result(self, meta, local_path):
+        """Формирование ответа в формате YouTubeDownloader."""
+        return {
+            "local_path": local_path,
+            "url": self.url_for(meta["filename"]),
+            "title": meta["title"],
+            "duration": meta["duration"]
+        }
+
+    def url_for(self, filename):
+        """
+        Формирование URL для доступа к файлу.
+
+        Args:
+            filename (str): Имя файла.
+
+        Returns:
+            str: Подписанная ссылка на общее хранилище или URL через /media.
+        """
+        if self.url_mode == "presigned" and self.shared is not None:
+            url = self.shared.presign(filename, self.presign_expires)
+            if url:
+                return url
+        return f"{self.base_url}/{filename}"
+
+    def lookup(self, video_id, suffix):
+        """
+        Поиск готового результата сначала в горячем кэше, затем в общем хранилище.
+
+        Args:
+            video_id (str): ID видео.
+            suffix (str): Вариант результата (например, '720p', 'audio', 'mp3').
+
+        Returns:
+            dict: Информация о файле или None, если результата нет.
+        """
+        key = self._cache_key(video_id, suffix)
+
+        meta = self._read_local_meta(key)
+        if meta:
+            local_path = os.path.join(self.download_dir, meta["filename"])
+            if os.path.isfile(local_path):
+                os.utime(local_path)
+                self.logger.info("Hot cache hit: %s", key, extra={"sampled": True})
+                return self._result(meta, local_path)
+
+        if self.shared is None:
+            return None
+
+        try:
+            data = self.shared.get_bytes(f"index/{key}.json")
+            if not data:
+                return None
+            meta = json.loads(data)
+
+            # Файл не копируется в потоке запроса: /media докачает его из общего хранилища при первом обращении
+            self.logger.info("Shared storage hit: %s", key)
+            return self._result(meta, None)
+        except Exception as e:
+            self.logger.error("Error reading %s from shared storage: %s", key, e)
+            return None
+
+    def store(self, local_path, video_id, suffix, title, duration):
+        """
+        Регистрация готового файла в горячем кэше и выгрузка в общее хранилище.
+
+        Args:
+            local_path (str): Путь к файлу в download_dir.
+            video_id (str): ID видео.
+            suffix (str): Вариант результата.
+            title (str): Название видео.
+            duration (int): Длительность в секундах.
+
+        Returns:
+            dict: Информация о файле в формате YouTubeDownloader.
+        """
+        key = self._cache_key(video_id, suffix)
+        filename = os.path.basename(local_path)
+        meta = {"filename": filename, "title": title, "duration": duration}
+
+        self._write_local_meta(key, meta)
+
+        if self.shared is not None:
+            try:
+                self.shared.put(local_path, filename)
+                self.shared.put_bytes(json.dumps(meta, ensure_ascii=False).encode("utf-8"), f"index/{key}.json")
+                self.logger.info("Uploaded to shared storage: %s", filename)
+            except Exception as e:
+                self.logger.error("Error uploading %s to shared storage: %s", filename, e)
+
+        self.evict(protect=local_path)
+        return self._result(meta, local_path)
+
+    def store_file(self, local_path):
+        """
+        Выгрузка вспомогательного файла (обложки, субтитров) в общее хранилище.
+
+        Args:
+            local_path (str): Путь к файлу в download_dir.
+        """
+        if self.shared is not None:
+            filename = os.path.basename(local_path)
+            try:
+                self.shared.put(local_path, filename)
+            except Exception as e:
+                self.logger.error("Error uploading %s to shared storage: %s", filename, e)
+
+        self.evict(protect=local_path)
+
+    def ensure_local(self, filename):
+        """
+        Возвращает путь к файлу в горячем кэше, при необходимости скачивая его из общего хранилища.
+
+        Args:
+            filename (str): Имя файла.
+
+        Returns:
+            str: Путь к локальному файлу или None, если файл недоступен.
+        """
+        if os.path.basename(filename) != filename or filename.startswith("."):
+            return None
+
+        local_path = os.path.join(self.download_dir, filename)
+        if os.path.isfile(local_path):
+            return local_path
+
+        if self.shared is None:
+            return None
+
+        with self._file_lock(filename):
+            # Файл мог докачать параллельный запрос, пока мы ждали блокировку
+            if os.path.isfile(local_path):
+                return local_path
+
+            try:
+                if not self.shared.exists(filename):
+                    return None
+                self.logger.info("Fetching from shared storage: %s", filename)
+                self.shared.get(filename, local_path)
+            except Exception as e:
+                self.logger.error("Error fetching %s from shared storage: %s", filename, e)
+                return None
+
+        self.evict(protect=local_path)
+        return local_path
+
+    def evict(self, protect=None):
+        """
+        Удаление давно не использованных файлов, пока горячий кэш превышает лимит.
+
+        Args:
+            protect (str, optional): Файл, который нельзя удалять.
+        """
+        if not self.max_size:
+            return
+
+        with self._lock:
+            entries = []
+            total_size = 0
+            for entry in os.scandir(self.download_dir):
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+            if total_size <= self.max_size:
+                return
+
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                if protect and os.path.abspath(path) == os.path.abspath(protect):
+                    continue
+                try:
+                    os.remove(path)
+                    total_size -= size
+                    self.logger.info("Evicted from hot cache: %s", os.path.basename(path))
+                except OSError as e:
+                    self.logger.warning("Cannot evict %s: %s", path, e)
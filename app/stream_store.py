@@ -0,0 +1,282 @@
+"""
+Хранилище исходных потоков (видео и аудио до склейки и перекодирования).
+Потоки адресуются по {video_id}/{format_id}, поэтому один и тот же bestaudio
+используется для всех разрешений и аудиопрофилей. Рядом с потоком хранится
+манифест с размером и SHA-256 для обнаружения недокачанных и поврежденных файлов.
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class StreamStore:
+    """Дедуплицированное хранилище исходных потоков с проверкой целостности."""
+
+    MANIFEST_EXT = ".json"
+
+    def __init__(self, root, max_size_mb=0, verify_hash=True):
+        """
+        Инициализация хранилища потоков.
+
+        Args:
+            root (str): Корневая директория (внутри temp_dir).
+            max_size_mb (int): Лимит размера; давно не использованные потоки удаляются первыми (0 - без лимита).
+            verify_hash (bool): Проверять SHA-256 потока, измененного после последней проверки, а не только размер.
+        """
+        self.root = root
+        self.max_size = int(max_size_mb) * 1024 * 1024
+        self.verify_hash = verify_hash
+
+        os.makedirs(self.root, exist_ok=True)
+
+        self._locks = {}
+        # Потоки, проверенные в этом процессе: путь -> (размер, mtime_ns) на момент проверки
+        self._verified = {}
+        # Потоки, которые используют выполняющиеся задачи: путь -> количество задач
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _safe(name):
+        """Имя, пригодное для файловой системы (format_id вида '616-drc', 'hls-1080p')."""
+        return re.sub(r"[^\w.-]", "_", str(name)).lstrip(".") or "_"
+
+    def _manifest_path(self, video_id, format_id):
+        return os.path.join(self.root, self._safe(video_id), f"{self._safe(format_id)}{self.MANIFEST_EXT}")
+
+    @staticmethod
+    def _sha256(path):
+        """SHA-256 файла, читаемого блоками."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _signature(path):
+        """Размер и время изменения файла, по которым видно, менялся ли он после проверки."""
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _remove(self, video_id, format_id, path=None):
+        """Удаление потока и его манифеста."""
+        self._verified.pop(path, None)
+        for target in (path, self._manifest_path(video_id, format_id)):
+            if target and os.path.exists(target):
+                os.remove(target)
+
+    @contextmanager
+    def lock(self, video_id, key):
+        """
+        Блокировка потока: одновременные запросы одного видео не загружают его дважды.
+        Запись блокировки удаляется, когда ее больше никто не ждет.
+
+        Args:
+            video_id (str): ID видео.
+            key (str): format_id или код формата.
+        """
+        with self._lock:
+            entry = self._locks.setdefault((video_id, key), [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[(video_id, key)]
+
+    @contextmanager
+    def lease(self):
+        """
+        Аренда потоков на время задачи: потоки, полученные через get или commit
+        с этой арендой, не вытесняются до выхода из блока (до конца склейки или перекодирования).
+
+        Yields:
+            list: Аренда для передачи в get и commit.
+        """
+        leased = []
+        try:
+            yield leased
+        finally:
+            with self._lock:
+                for path in leased:
+                    count = self._pinned[path] - 1
+                    if count:
+                        self._pinned[path] = count
+                    else:
+                        del self._pinned[path]
+
+    def _pin(self, path, lease):
+        """Закрепление потока за арендой; evict не удаляет закрепленные потоки."""
+        if lease is None:
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pinned[path] = self._pinned.get(path, 0) + 1
+        lease.append(path)
+
+    def staging_path(self, video_id, key):
+        """
+        Путь для загрузки потока (без расширения); постоянен для одного ключа,
+        поэтому недокачанный .part файл продолжается следующим запросом.
+
+        Args:
+            video_id (str): ID видео.
+            key (str): format_id или код формата.
+
+        Returns:
+            str: Путь без расширения.
+        """
+        directory = os.path.join(self.root, self._safe(video_id))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f".incoming-{self._safe(key)}")
+
+    def get(self, video_id, format_id, lease=None):
+        """
+        Поиск проверенного потока.
+
+        Args:
+            video_id (str): ID видео.
+            format_id (str): ID формата yt-dlp.
+            lease (list, optional): Аренда из lease(), за которой закрепляется поток.
+
+        Returns:
+            str: Путь к потоку или None, если потока нет или он поврежден.
+        """
+        try:
+            with open(self._manifest_path(video_id, format_id), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        path = os.path.join(self.root, self._safe(video_id), manifest["filename"])
+        # Закрепляем до проверки, чтобы поток не вытеснили между проверкой и использованием
+        self._pin(path, lease)
+
+        if not os.path.isfile(path) or os.path.getsize(path) != manifest["size"]:
+            self.logger.warning("Stream %s/%s is missing or truncated, discarding", video_id, format_id)
+            self._remove(video_id, format_id, path)
+            return None
+
+        # Хеш пересчитывается, только если файл изменился после последней проверки
+        if self.verify_hash and self._verified.get(path) != self._signature(path):
+            if self._sha256(path) != manifest["sha256"]:
+                self.logger.warning("Stream %s/%s checksum mismatch, discarding", video_id, format_id)
+                self._remove(video_id, format_id, path)
+                return None
+
+        # Время использования для вытеснения давно не использованных потоков
+        os.utime(path)
+        self._verified[path] = self._signature(path)
+        return path
+
+    def commit(self, video_id, format_id, downloaded_path, lease=None):
+        """
+        Регистрация загруженного потока с размером и SHA-256.
+        Полноту загрузки проверяет сам yt-dlp по Content-Length до постобработки
+        (например, FFmpegFixupM4a для DASH m4a, которая меняет размер файла).
+
+        Args:
+            video_id (str): ID видео.
+            format_id (str): ID формата yt-dlp.
+            downloaded_path (str): Загруженный файл (из staging_path).
+            lease (list, optional): Аренда из lease(), за которой закрепляется поток.
+
+        Returns:
+            str: Путь к потоку в хранилище.
+        """
+        size = os.path.getsize(downloaded_path)
+        ext = os.path.splitext(downloaded_path)[1]
+        filename = f"{self._safe(format_id)}{ext}"
+        path = os.path.join(self.root, self._safe(video_id), filename)
+        self._pin(path, lease)
+        os.replace(downloaded_path, path)
+
+        manifest = {
+            "format_id": format_id,
+            "filename": filename,
+            "size": size,
+            "sha256": self._sha256(path)
+        }
+        with open(self._manifest_path(video_id, format_id), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        self._verified[path] = self._signature(path)
+
+        self.logger.info("Stored stream %s/%s (%s bytes)", video_id, format_id, size)
+        self.evict(protect=path)
+        return path
+
+    def export(self, stream_path, output_path):
+        """
+        Размещение потока как готового результата без копирования данных, если возможно.
+
+        Args:
+            stream_path (str): Путь к потоку в хранилище.
+            output_path (str): Путь результата в download_dir.
+        """
+        try:
+            os.link(stream_path, output_path)
+        except OSError:
+            # Другая файловая система или жесткие ссылки не поддерживаются
+            shutil.copyfile(stream_path, output_path)
+
+    def evict(self, protect=None):
+        """
+        Удаление давно не использованных потоков, пока хранилище превышает лимит.
+
+        Потоки, закрепленные арендой выполняющихся задач, не удаляются.
+
+        Args:
+            protect (str, optional): Поток, который нельзя удалять.
+        """
+        if not self.max_size:
+            return
+
+        with self._lock:
+            entries = []
+            total_size = 0
+            for video_entry in os.scandir(self.root):
+                if not video_entry.is_dir():
+                    continue
+                for entry in os.scandir(video_entry.path):
+                    if not entry.name.endswith(self.MANIFEST_EXT):
+                        continue
+                    try:
+                        with open(entry.path, "r", encoding="utf-8") as f:
+                            manifest = json.load(f)
+                        stat = os.stat(os.path.join(video_entry.path, manifest["filename"]))
+                    except (OSError, ValueError, KeyError):
+                        continue
+                    path = os.path.join(video_entry.path, manifest["filename"])
+                    entries.append((stat.st_mtime, stat.st_size, path, entry.path))
+                    total_size += stat.st_size
+
+            if total_size <= self.max_size:
+                return
+
+            for _, size, path, manifest_path in sorted(entries):
+                if total_size <= self.max_size:
+                    break
+                if protect and os.path.abspath(path) == os.path.abspath(protect):
+                    continue
+                if os.path.abspath(path) in self._pinned:
+                    continue
+                try:
+                    os.remove(manifest_path)
+                    os.remove(path)
+                    self._verified.pop(path, None)
+                    total_size -= size
+                    self.logger.info("Evicted stream: %s", os.path.relpath(path, self.root))
+                except OSError as e:
+                    self.logger.warning("Cannot evict %s: %s", path, e)
@@ -0,0 +1,265 @@
+"""
+Подсистема профилей перекодирования аудио (opus/aac/mp3).
+Выбирает кодек, битрейт и режим VBR/CBR, копирует поток без перекодирования,
+если исходный кодек уже совпадает, и кодирует длинные файлы параллельными сегментами,
+если сегменты кодека склеиваются без пауз.
+"""
+
+import os
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# ffmpeg импортируется в методах, чтобы не замедлять старт сервиса
+
+
+# Параметры поддерживаемых кодеков.
+# segmentable - сегменты можно склеить копированием без пауз. Кодировщик добавляет
+# в начало и конец каждого сегмента задержку и выравнивание (LAME delay и кадр Xing в mp3,
+# 1024 сэмпла priming в AAC, pre-skip в Opus), поэтому на каждом стыке появляется пауза
+# или щелчок; такие кодеки всегда кодируются одним процессом.
+CODECS = {
+    "mp3": {"encoder": "libmp3lame", "ext": ".mp3", "source_codecs": ("mp3",), "segmentable": False},
+    "opus": {"encoder": "libopus", "ext": ".opus", "source_codecs": ("opus",), "segmentable": False},
+    "aac": {"encoder": "aac", "ext": ".m4a", "source_codecs": ("aac",), "segmentable": False},
+}
+
+# Профили по умолчанию; дополняются и переопределяются секцией transcode.profiles
+DEFAULT_PROFILES = {
+    "mp3": {"codec": "mp3", "bitrate": "192k", "mode": "cbr"},
+    "mp3-vbr": {"codec": "mp3", "quality": 2, "mode": "vbr"},
+    "opus": {"codec": "opus", "bitrate": "96k", "mode": "vbr"},
+    "aac": {"codec": "aac", "bitrate": "128k", "mode": "cbr"},
+}
+
+
+class Transcoder:
+    """Перекодирование аудио по именованным профилям."""
+
+    def __init__(self, profiles=None, threads=0, segment_seconds=600, parallel_segments=4):
+        """
+        Инициализация перекодировщика.
+
+        Args:
+            profiles (dict, optional): Дополнительные профили из конфигурации.
+            threads (int): Количество потоков ffmpeg на один процесс (0 - автоматически).
+            segment_seconds (int): Длина сегмента при параллельном кодировании в секундах.
+            parallel_segments (int): Количество параллельно кодируемых сегментов (1 - отключено);
+                применяется только к кодекам с segmentable.
+        """
+        self.profiles = dict(DEFAULT_PROFILES)
+        self.profiles.update(profiles or {})
+        self.threads = threads
+        self.segment_seconds = segment_seconds
+        self.parallel_segments = parallel_segments
+        self.logger = logging.getLogger(__name__)
+
+    def resolve(self, name, bitrate=None, mode=None):
+        """
+        Получение профиля с учетом параметров запроса.
+
+        Args:
+            name (str): Имя профиля.
+            bitrate (str, optional): Битрейт (например, '128k').
+            mode (str, optional): Режим 'vbr' или 'cbr'.
+
+        Returns:
+            dict: Профиль перекодирования.
+
+        Raises:
+            ValueError: Если профиль или параметры некорректны.
+        """
+        if name not in self.profiles:
+            raise ValueError(f"Unknown transcode profile: {name}")
+
+        profile = dict(self.profiles[name], name=name)
+
+        if profile.get("codec") not in CODECS:
+            raise ValueError(f"Unsupported codec in profile {name}: {profile.get('codec')}")
+
+        if bitrate:
+            bitrate = str(bitrate).lower()
+            if not bitrate.rstrip("k").isdigit():
+                raise ValueError("Bitrate must look like '128k'")
+            profile["bitrate"] = bitrate if bitrate.endswith("k") else f"{bitrate}k"
+            profile.pop("quality", None)
+
+        if mode:
+            if mode not in ("vbr", "cbr"):
+                raise ValueError("Mode must be 'vbr' or 'cbr'")
+            profile["mode"] = mode
+
+        if profile.get("mode") == "cbr" and not profile.get("bitrate"):
+            raise ValueError("CBR mode requires a bitrate")
+
+        return profile
+
+    @staticmethod
+    def variant(profile):
+        """
+        Вариант результата для кэша: разные настройки кэшируются отдельно.
+
+        Args:
+            profile (dict): Профиль перекодирования.
+
+        Returns:
+            str: Суффикс варианта (например, 'opus-96k-vbr').
+        """
+        rate = profile.get("bitrate") or f"q{profile.get('quality', 'auto')}"
+        return f"{profile['codec']}-{rate}-{profile.get('mode', 'cbr')}"
+
+    @staticmethod
+    def extension(profile):
+        """Расширение выходного файла профиля."""
+        return CODECS[profile["codec"]]["ext"]
+
+    def _output_args(self, profile):
+        """
+        Параметры кодировщика ffmpeg для профиля.
+
+        Args:
+            profile (dict): Профиль перекодирования.
+
+        Returns:
+            dict: Аргументы для ffmpeg.output.
+        """
+        codec = profile["codec"]
+        args = {"acodec": CODECS[codec]["encoder"], "vn": None, "threads": self.threads}
+        vbr = profile.get("mode") == "vbr"
+
+        if codec == "mp3" and vbr and not profile.get("bitrate"):
+            args["q:a"] = profile.get("quality", 2)
+        elif profile.get("bitrate"):
+            args["audio_bitrate"] = profile["bitrate"]
+
+        if codec == "mp3" and vbr and profile.get("bitrate"):
+            # Средний битрейт для LAME задается через ABR
+            args["abr"] = 1
+        if codec == "opus":
+            args["vbr"] = "on" if vbr else "off"
+
+        return args
+
+    @staticmethod
+    def _source_audio(source_path):
+        """
+        Кодек и битрейт первого аудиопотока исходного файла.
+
+        Returns:
+            tuple: (кодек или None, битрейт в бит/с или None)
+        """
+        import ffmpeg
+
+        try:
+            probe = ffmpeg.probe(source_path)
+        except Exception:
+            return None, None
+
+        for stream in probe.get("streams", []):
+            if stream.get("codec_type") == "audio":
+                # В webm битрейт потока обычно не указан, тогда берем битрейт контейнера
+                bit_rate = stream.get("bit_rate") or probe.get("format", {}).get("bit_rate")
+                return stream.get("codec_name"), int(bit_rate) if bit_rate else None
+        return None, None
+
+    @staticmethod
+    def _can_copy(profile, source_codec, source_bitrate):
+        """
+        Можно ли отдать исходный поток без перекодирования.
+        Копия допустима, только если она не превышает запрошенный битрейт,
+        иначе результат с ключом кэша вида 'opus-48k-vbr' содержал бы исходные ~160k.
+        """
+        if not profile.get("allow_copy", True) or source_codec not in CODECS[profile["codec"]]["source_codecs"]:
+            return False
+        if not profile.get("bitrate"):
+            return True
+        if not source_bitrate:
+            return False
+        return source_bitrate <= int(profile["bitrate"].rstrip("k")) * 1000
+
+    def _encode(self, source_path, output_path, profile, start=None, length=None):
+        """Кодирование файла (или его фрагмента) одним процессом ffmpeg."""
+        import ffmpeg
+
+        input_args = {}
+        if start is not None:
+            input_args["ss"] = start
+        if length is not None:
+            input_args["t"] = length
+
+        ffmpeg.input(source_path, **input_args).output(
+            output_path, loglevel='quiet', **self._output_args(profile)
+        ).run(overwrite_output=True)
+
+    def _encode_segments(self, source_path, output_path, profile, duration):
+        """
+        Параллельное кодирование сегментов и их склейка без перекодирования.
+
+        Args:
+            source_path (str): Исходный файл.
+            output_path (str): Выходной файл.
+            profile (dict): Профиль перекодирования.
+            duration (float): Длительность исходного файла в секундах.
+        """
+        import ffmpeg
+
+        ext = self.extension(profile)
+        starts = list(range(0, math.ceil(duration), self.segment_seconds))
+
+        # Сегменты хранятся рядом с исходным (временным) файлом, а не в download_dir
+        work_prefix = os.path.join(os.path.dirname(source_path), os.path.basename(output_path))
+        segments = [f"{work_prefix}.seg{i:04d}{ext}" for i in range(len(starts))]
+        list_path = f"{work_prefix}.segments.txt"
+
+        self.logger.info("Transcoding %s segments in parallel", len(segments))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallel_segments) as executor:
+                futures = [
+                    executor.submit(self._encode, source_path, segment, profile, start, self.segment_seconds)
+                    for start, segment in zip(starts, segments)
+                ]
+                for future in futures:
+                    future.result()
+
+            with open(list_path, "w", encoding="utf-8") as f:
+                for segment in segments:
+                    f.write(f"file '{os.path.abspath(segment)}'\n")
+
+            ffmpeg.input(list_path, format='concat', safe=0).output(
+                output_path, c='copy', loglevel='quiet'
+            ).run(overwrite_output=True)
+        finally:
+            for path in segments + [list_path]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def transcode(self, source_path, output_path, profile, duration=None):
+        """
+        Перекодирование аудио по профилю.
+
+        Args:
+            source_path (str): Исходный файл.
+            output_path (str): Выходной файл.
+            profile (dict): Профиль перекодирования.
+            duration (float, optional): Длительность в секундах для выбора сегментного режима.
+        """
+        import ffmpeg
+
+        source_codec, source_bitrate = self._source_audio(source_path)
+
+        # Быстрый путь: исходный поток уже в нужном кодеке и не выше запрошенного битрейта
+        if self._can_copy(profile, source_codec, source_bitrate):
+            self.logger.info("Stream copy of %s audio (%s bit/s)", source_codec, source_bitrate)
+            ffmpeg.input(source_path).output(
+                output_path, acodec='copy', vn=None, loglevel='quiet'
+            ).run(overwrite_output=True)
+            return
+
+        segmentable = CODECS[profile["codec"]].get("segmentable", False)
+        if segmentable and self.parallel_segments > 1 and duration and duration > 2 * self.segment_seconds:
+            self._encode_segments(source_path, output_path, profile, duration)
+            return
+
+        self.logger.info("Transcoding %s audio with profile %s", source_codec, profile['name'])
+        self._encode(source_path, output_path, profile)
@@ -1,49 +1,223 @@
 """
 Модуль настройки логирования для всех компонентов приложения.
+Записи передаются через очередь в отдельный поток (QueueHandler/QueueListener),
+поэтому рабочие потоки не ждут диска; каждая запись содержит trace ID запроса.
 """
 
+import atexit
+import contextvars
+import json
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 
-def setup_logger(log_file="youtube_downloader.log", level=logging.INFO):
+# Идентификатор трассировки текущего запроса/задачи
+_trace_id = contextvars.ContextVar("trace_id", default="-")
+
+# Стандартные атрибуты LogRecord; все остальные попадают в JSON как поля extra
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Активный поток записи логов
+_listener = None
+
+
+def new_trace_id(value=None):
+    """
+    Установка trace ID для текущего контекста.
+
+    Args:
+        value (str, optional): Готовый идентификатор (например, из заголовка X-Request-ID).
+
+    Returns:
+        Token: Токен для восстановления предыдущего значения.
+    """
+    return _trace_id.set(value or uuid.uuid4().hex[:16])
+
+
+def reset_trace_id(token):
+    """Восстановление trace ID, действовавшего до new_trace_id."""
+    _trace_id.reset(token)
+
+
+def get_trace_id():
+    """Текущий trace ID."""
+    return _trace_id.get()
+
+
+@contextmanager
+def log_stage(logger, stage):
+    """
+    Замер длительности этапа обработки с записью в лог.
+
+    Args:
+        logger (logging.Logger): Логгер этапа.
+        stage (str): Название этапа.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        logger.info("Stage %s took %.1f ms", stage, duration_ms,
+                    extra={"stage": stage, "duration_ms": round(duration_ms, 1)})
+
+
+class TraceFilter(logging.Filter):
+    """Добавляет trace ID и выборочно отбрасывает высокочастотные записи."""
+
+    def __init__(self, sample_rate=1.0):
+        """
+        Args:
+            sample_rate (float): Доля сохраняемых записей с extra={"sampled": True}.
+        """
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        record.trace_id = _trace_id.get()
+
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирование записей в одну строку JSON."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "sampled":
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в рабочем потоке
+    и отбрасывает записи при переполнении очереди вместо ожидания.
+    """
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Форматирование выполняется в потоке QueueListener
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class ReportingQueueListener(QueueListener):
+    """QueueListener, который сообщает о записях, отброшенных NonBlockingQueueHandler."""
+
+    def __init__(self, queue, *handlers, respect_handler_level=False):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self._reported = 0
+
+    def handle(self, record):
+        # Сообщение пишется в обработчики напрямую: в переполненную очередь его не поставить
+        dropped = NonBlockingQueueHandler.dropped
+        if dropped != self._reported:
+            count = dropped - self._reported
+            self._reported = dropped
+            super().handle(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "Dropped %s log records: log queue is full",
+                "args": (count,),
+                "trace_id": "-",
+                "dropped_records": count
+            }))
+        super().handle(record)
+
+
+def _stop_listener():
+    """Остановка потока записи логов с выгрузкой оставшихся записей."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def setup_logger(log_file="youtube_downloader.log", level=logging.INFO, json_format=True,
+                 queue_size=10000, sample_rate=1.0):
     """
     Настройка логирования для приложения.
 
     Args:
         log_file (str): Имя файла для логирования.
         level (int): Уровень логирования.
+        json_format (bool): Писать записи в формате JSON.
+        queue_size (int): Размер очереди записей; при переполнении записи отбрасываются.
+        sample_rate (float): Доля сохраняемых высокочастотных записей.
     """
+    global _listener
+
     # Получение корневого логгера
     logger = logging.getLogger()
     logger.setLevel(level)
-    
+
     # Очистка обработчиков, чтобы избежать дублирования логов
     logger.handlers.clear()
-    
+    _stop_listener()
+
     # Создание форматтера для логов
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s')
+
     # Создание обработчика для вывода в файл с ротацией
     file_handler = RotatingFileHandler(
         log_file, maxBytes=10*1024*1024, backupCount=5, encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
+
     # Создание обработчика для вывода в консоль
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
+
+    # Запись в файл и консоль выполняется отдельным потоком
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(TraceFilter(sample_rate))
+    logger.addHandler(queue_handler)
+
+    _listener = ReportingQueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+
     # Установка уровня логирования для сторонних библиотек
     logging.getLogger('waitress').setLevel(logging.WARNING)
     logging.getLogger('flask').setLevel(logging.WARNING)
     logging.getLogger('werkzeug').setLevel(logging.WARNING)
-    
+
     # Отключение логирования yt-dlp
     logging.getLogger('yt_dlp').setLevel(logging.CRITICAL)
-    
+
     # Логирование информации о запуске
-    logger.info("Logger initialized")
\ No newline at end of file
+    logger.info("Logger initialized")
@@ -10,7 +10,23 @@ import json
 import threading
 import time
 
-from app.downloader import YouTubeDownloader
+from app.downloader import YouTubeDownloader, INFO_OPTIONS, DOWNLOAD_OPTIONS
+from app.storage import ResultStorage
+from app.session_pool import YoutubeDLPool
+from app.resilience import RetryPolicy, CircuitBreaker, CircuitOpenError
+from app.transcoder import Transcoder
+from app.prefetch import Prefetcher
+from app.sidecars import SidecarFetcher
+from app.stream_store import StreamStore
+from app.warmup import Warmup
+from app.scheduler import (
+    DownloadScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_INTERACTIVE_HEAVY,
+    PRIORITY_BATCH,
+    JOB_DONE,
+    JOB_FAILED
+)
 
 
 class VideoService:
@@ -29,29 +45,256 @@ class VideoService:
         self.temp_dir = config["downloader"]["temp_dir"]
         self.default_resolution = config["downloader"]["default_resolution"]
         
+        self.storage = ResultStorage(
+            download_dir=self.download_dir,
+            base_url=self.base_url,
+            config=config.get("storage")
+        )
+        
+        pool_config = config["downloader"].get("session_pool", {})
+        self.session_pool = YoutubeDLPool(
+            max_uses=pool_config.get("max_uses", 50),
+            max_idle=pool_config.get("max_idle", 4)
+        )
+        
+        # Прогрев yt_dlp и первых сессий; запускается из YouTubeDownloaderAPI
+        self.warmup = Warmup(self.session_pool, profiles=(INFO_OPTIONS, DOWNLOAD_OPTIONS))
+        
+        retry_config = config["downloader"].get("retry", {})
+        breaker_config = config["downloader"].get("circuit_breaker", {})
+        self.circuit_breaker = CircuitBreaker(
+            window_seconds=breaker_config.get("window_seconds", 60),
+            min_requests=breaker_config.get("min_requests", 10),
+            failure_ratio=breaker_config.get("failure_ratio", 0.5),
+            cooldown_seconds=breaker_config.get("cooldown_seconds", 30)
+        )
+        
+        transcode_config = config.get("transcode", {})
+        self.transcoder = Transcoder(
+            profiles=transcode_config.get("profiles"),
+            threads=transcode_config.get("threads", 0),
+            segment_seconds=transcode_config.get("segment_seconds", 600),
+            parallel_segments=transcode_config.get("parallel_segments", 4)
+        )
+        
+        sidecar_config = config.get("sidecars", {})
+        self.sidecar_fetcher = SidecarFetcher(
+            download_dir=self.download_dir,
+            base_url=self.base_url,
+            storage=self.storage,
+            pool_size=sidecar_config.get("pool_size", 8),
+            timeout=sidecar_config.get("timeout", 30)
+        )
+        
+        # Исходные потоки по {video_id}/{format_id}: общие для разрешений и аудиопрофилей
+        stream_config = config["downloader"].get("stream_store", {})
+        self.stream_store = StreamStore(
+            root=os.path.join(self.temp_dir, "streams"),
+            max_size_mb=stream_config.get("max_size_mb", 0),
+            verify_hash=stream_config.get("verify_hash", True)
+        )
+        
         self.downloader = YouTubeDownloader(
             download_dir=self.download_dir,
             temp_dir=self.temp_dir,
-            base_url=self.base_url
+            base_url=self.base_url,
+            storage=self.storage,
+            session_pool=self.session_pool,
+            retry_policy=RetryPolicy(
+                max_attempts=retry_config.get("max_attempts", 3),
+                base_delay=retry_config.get("base_delay", 1.0),
+                max_delay=retry_config.get("max_delay", 30.0)
+            ),
+            circuit_breaker=self.circuit_breaker,
+            transcoder=self.transcoder,
+            sidecar_fetcher=self.sidecar_fetcher,
+            stream_store=self.stream_store
         )
         
+        scheduler_config = config.get("scheduler", {})
+        self.heavy_resolution = scheduler_config.get("heavy_resolution", 720)
+        self.scheduler = DownloadScheduler(
+            workers=scheduler_config.get("workers", 4),
+            aging_seconds=scheduler_config.get("aging_seconds", 60),
+            client_weights=scheduler_config.get("client_weights"),
+            result_ttl=scheduler_config.get("result_ttl_seconds", 600),
+            background_workers=scheduler_config.get("background_workers", 1)
+        )
+        self.max_queued_per_client = scheduler_config.get("max_queued_per_client", 50)
+        
+        # Фоновая предзагрузка новых видео с отслеживаемых каналов
+        prefetch_config = config.get("prefetch", {})
+        self.prefetcher = Prefetcher(self.downloader, self.scheduler, self.circuit_breaker, prefetch_config)
+        if prefetch_config.get("enabled", False):
+            self.prefetcher.start()
+        
         self.logger = logging.getLogger(__name__)
         
+    def _priority_class(self, priority, resolution=None):
+        """
+        Определение класса приоритета задачи.
+
+        Args:
+            priority (str): Запрошенный приоритет ('interactive' или 'batch').
+            resolution (int, optional): Разрешение видео; None для аудио.
+
+        Returns:
+            int: Класс приоритета планировщика.
+        """
+        if priority == "batch":
+            return PRIORITY_BATCH
+        if resolution is not None and resolution > self.heavy_resolution:
+            return PRIORITY_INTERACTIVE_HEAVY
+        return PRIORITY_INTERACTIVE
+
+    def _overloaded_response(self):
+        """
+        Ответ при разомкнутом выключателе экстрактора.
+
+        Returns:
+            tuple: (результат, код_ответа)
+        """
+        return {
+            "error": "YouTube extractor is temporarily unavailable, try again later",
+            "retry_after": self.circuit_breaker.retry_after()
+        }, 503
+
+    def queue_status(self, client=None):
+        """
+        Состояние очереди загрузок.
+
+        Args:
+            client (str, optional): Идентификатор клиента.
+
+        Returns:
+            dict: Позиции задач и оценка времени их запуска.
+        """
+        return self.scheduler.queue_status(client)
+
+    def _enqueue(self, func, client, priority_class, cost, error, respond_async=False):
+        """
+        Постановка загрузки в очередь.
+
+        Args:
+            func (callable): Функция загрузки; None означает ошибку загрузки.
+            client (str): Идентификатор клиента.
+            priority_class (int): Класс приоритета планировщика.
+            cost (float): Относительная стоимость задачи.
+            error (str): Сообщение для клиента, если загрузка не удалась.
+            respond_async (bool): Не ждать завершения, а сразу вернуть 202 с job_id.
+
+        Returns:
+            tuple: (результат, код_ответа) - результат загрузки, 202 с job_id
+                или 429 при переполнении очереди клиента.
+        """
+        def job():
+            # Выключатель мог разомкнуться, пока задача ждала в очереди
+            if not self.circuit_breaker.allow_request():
+                raise CircuitOpenError("Circuit breaker is open")
+            result = func()
+            if result is None:
+                raise RuntimeError(error)
+            return result
+        
+        queued = self.scheduler.submit(job, client, priority_class, cost, self.max_queued_per_client)
+        if queued is None:
+            return {"error": f"Too many queued downloads, at most {self.max_queued_per_client} per client"}, 429
+        
+        if not respond_async:
+            queued.done.wait()
+        return self._job_response(queued)
+
+    def job_status(self, job_id, client):
+        """
+        Состояние задачи загрузки.
+
+        Args:
+            job_id (str): ID задачи.
+            client (str): Идентификатор клиента; чужие задачи не видны.
+
+        Returns:
+            tuple: (результат, код_ответа) - 202 пока задача в очереди или выполняется,
+                200 с результатом загрузки, 500 при ошибке, 404 если задача не найдена.
+        """
+        job = self.scheduler.get(job_id)
+        if job is None or job.client != client:
+            return {"error": "Job not found"}, 404
+        return self._job_response(job)
 
-    def download_video(self, url, resolution=None):
+    def _job_response(self, job):
+        """
+        Ответ с состоянием задачи.
+
+        Args:
+            job (Job): Задача планировщика.
+
+        Returns:
+            tuple: (результат, код_ответа)
+        """
+        if job.state == JOB_DONE:
+            return job.result, 200
+        if job.state == JOB_FAILED:
+            if isinstance(job.error, CircuitOpenError):
+                return self._overloaded_response()
+            return {"error": str(job.error), "job_id": job.id}, 500
+        
+        status = {"job_id": job.id, "status": job.state, "status_url": f"/v1/jobs/{job.id}"}
+        queued = next((entry for entry in self.scheduler.queue_status(job.client)["jobs"] if entry["job_id"] == job.id), None)
+        if queued:
+            status.update(position=queued["position"], estimated_start_seconds=queued["estimated_start_seconds"])
+        return status, 202
+
+
+    def _cached_response(self, url, suffix, sidecar_options, client, priority_class, respond_async=False):
+        """
+        Ответ для готового результата без загрузки медиа.
+        Если сопутствующих файлов нет в кэше, для них нужна информация о видео,
+        поэтому они загружаются задачей планировщика с проверкой выключателя.
+
+        Args:
+            url (str): URL видео на YouTube.
+            suffix (str): Вариант результата.
+            sidecar_options (dict, optional): Параметры сопутствующих файлов.
+            client (str): Идентификатор клиента.
+            priority_class (int): Класс приоритета планировщика.
+            respond_async (bool): Не ждать загрузки сопутствующих файлов, а вернуть 202 с job_id.
+
+        Returns:
+            tuple: (результат, код_ответа) или None, если готового результата нет.
+        """
+        result = self.downloader.find_cached(url, suffix)
+        if result is None:
+            return None
+        
+        if self.downloader.sidecars_cached(url, sidecar_options):
+            return self.downloader.attach_sidecars(result, url, sidecar_options), 200
+        
+        if not self.circuit_breaker.accepting():
+            return self._overloaded_response()
+        return self._enqueue(
+            lambda: self.downloader.attach_sidecars(result, url, sidecar_options),
+            client, priority_class, 0.25, "Failed to fetch sidecars", respond_async
+        )
+
+    def download_video(self, url, resolution=None, client="anonymous", priority=None, sidecars=None,
+                       respond_async=False):
         """
         Обрабатывает запрос на скачивание видео.
 
         Args:
             url (str): URL видео на YouTube.
             resolution (int, optional): Желаемое разрешение видео.
+            client (str): Идентификатор клиента для справедливого разделения очереди.
+            priority (str, optional): Приоритет задачи ('interactive' или 'batch').
+            sidecars (dict, optional): Параметры запроса thumbnail, subtitles и chapters.
+            respond_async (bool): Не ждать загрузки, а сразу вернуть 202 с job_id.
 
         Returns:
             tuple: (результат, код_ответа)
                 результат: dict с информацией о скачанном файле или с ошибкой
-                код_ответа: HTTP-код ответа
+                код_ответа: HTTP-код ответа (202 с job_id в асинхронном режиме)
         """
-        self.logger.info(f"Received request to download video: {url}")
+        self.logger.info("Received request to download video: %s", url)
         
         # Валидация URL
         if not url:
@@ -68,36 +311,91 @@ class VideoService:
             except ValueError:
                 return {"error": "Resolution must be a valid integer"}, 400
         
-        # Скачивание видео
-        result = self.downloader.download_video(url, resolution)
+        if priority not in (None, "interactive", "batch"):
+            return {"error": "Priority must be 'interactive' or 'batch'"}, 400
         
-        if result is None:
-            return {"error": "Failed to download video"}, 500
+        try:
+            sidecar_options = SidecarFetcher.parse_options(**(sidecars or {}))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        
+        priority_class = self._priority_class(priority, resolution)
+        
+        # Готовый результат отдаем без постановки в очередь
+        cached = self._cached_response(url, f"{resolution}p", sidecar_options, client, priority_class, respond_async)
+        if cached is not None:
+            return cached
+        
+        if not self.circuit_breaker.accepting():
+            return self._overloaded_response()
             
-        return result, 200
+        # Стоимость задачи растет с количеством пикселей
+        cost = max((resolution / 720) ** 2, 0.25)
+        return self._enqueue(
+            lambda: self.downloader.download_video(url, resolution, sidecars=sidecar_options),
+            client, priority_class, cost, "Failed to download video", respond_async
+        )
 
-    def download_audio(self, url, convert_to_mp3=False):
+    def download_audio(self, url, convert_to_mp3=False, client="anonymous", priority=None,
+                       profile=None, bitrate=None, mode=None, sidecars=None, respond_async=False):
         """
         Обрабатывает запрос на скачивание аудио.
 
         Args:
             url (str): URL видео на YouTube.
-            convert_to_mp3 (bool): Конвертировать в MP3 формат.
+            convert_to_mp3 (bool): Конвертировать в MP3 формат (профиль 'mp3').
+            client (str): Идентификатор клиента для справедливого разделения очереди.
+            priority (str, optional): Приоритет задачи ('interactive' или 'batch').
+            profile (str, optional): Имя профиля перекодирования.
+            bitrate (str, optional): Битрейт, переопределяющий профиль.
+            mode (str, optional): Режим 'vbr' или 'cbr', переопределяющий профиль.
+            sidecars (dict, optional): Параметры запроса thumbnail, subtitles и chapters.
+            respond_async (bool): Не ждать загрузки, а сразу вернуть 202 с job_id.
 
         Returns:
             tuple: (результат, код_ответа)
-                результат: dict с информацией о скачанном файле или с ошибкой код_ответа: HTTP-код ответа
+                результат: dict с информацией о скачанном файле или с ошибкой
+                код_ответа: HTTP-код ответа (202 с job_id в асинхронном режиме)
         """
-        self.logger.info(f"Received request to download audio: {url}, convert_to_mp3={convert_to_mp3}")
+        self.logger.info("Received request to download audio: %s, convert_to_mp3=%s", url, convert_to_mp3)
         
         # Валидация URL
         if not url:
             return {"error": "URL is required"}, 400
             
-        # Скачивание аудио
-        result = self.downloader.download_audio(url, convert_to_mp3)
+        if priority not in (None, "interactive", "batch"):
+            return {"error": "Priority must be 'interactive' or 'batch'"}, 400
         
-        if result is None:
-            return {"error": "Failed to download audio"}, 500
+        # Определение профиля перекодирования
+        if convert_to_mp3 and profile is None:
+            profile = "mp3"
+        
+        transcode_profile = None
+        if profile is not None:
+            try:
+                transcode_profile = self.transcoder.resolve(profile, bitrate, mode)
+            except ValueError as e:
+                return {"error": str(e)}, 400
+        
+        try:
+            sidecar_options = SidecarFetcher.parse_options(**(sidecars or {}))
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        
+        suffix = self.transcoder.variant(transcode_profile) if transcode_profile else "audio"
+        
+        priority_class = self._priority_class(priority)
+        
+        # Готовый результат отдаем без постановки в очередь
+        cached = self._cached_response(url, suffix, sidecar_options, client, priority_class, respond_async)
+        if cached is not None:
+            return cached
+        
+        if not self.circuit_breaker.accepting():
+            return self._overloaded_response()
             
-        return result, 200
+        cost = 0.75 if transcode_profile else 0.5
+        return self._enqueue(
+            lambda: self.downloader.download_audio(url, profile=transcode_profile, sidecars=sidecar_options),
+            client, priority_class, cost, "Failed to download audio", respond_async
+        )
@@ -0,0 +1,128 @@
+"""
+Прогрев тяжелых зависимостей после старта сервиса.
+Порт открывается сразу, а yt_dlp с реестром экстракторов, ffmpeg и requests
+загружаются в фоновом потоке; готовность к загрузкам отдается через /ready.
+"""
+
+import importlib
+import logging
+import threading
+import time
+
+from app.resilience import RetryPolicy
+
+
+# Модули, импорт которых откладывается до прогрева или первой загрузки
+HEAVY_MODULES = ("yt_dlp", "ffmpeg", "requests")
+
+
+class Warmup:
+    """Фоновая загрузка зависимостей и создание первых сессий YoutubeDL."""
+
+    def __init__(self, session_pool, profiles=(), retry_policy=None):
+        """
+        Инициализация прогрева.
+
+        Args:
+            session_pool (YoutubeDLPool): Пул сессий YoutubeDL.
+            profiles (tuple): Профили опций, для которых заранее создается сессия.
+            retry_policy (RetryPolicy, optional): Задержки между повторами неудачного прогрева.
+        """
+        self.session_pool = session_pool
+        self.profiles = profiles
+        self.retry_policy = retry_policy or RetryPolicy(base_delay=1.0, max_delay=60.0)
+
+        self.import_times = {}
+        self.duration_ms = None
+        self.error = None
+        self.attempts = 0
+        self.lazy = False
+        self._ready = threading.Event()
+        self._thread = None
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start(self):
+        """Запуск прогрева в фоновом потоке; неудачный прогрев повторяется с нарастающей задержкой."""
+        if self._thread is not None or self.ready:
+            return
+
+        self._thread = threading.Thread(target=self._run_until_ready, name="warmup", daemon=True)
+        self._thread.start()
+
+    def skip(self):
+        """
+        Режим без прогрева: зависимости загружаются первой загрузкой.
+        Сервис сразу считается готовым, иначе проба готовности никогда не пустила бы к нему запросы.
+        """
+        self.lazy = True
+        self._ready.set()
+
+    def _run_until_ready(self):
+        while not self.run():
+            delay = self.retry_policy.delay(self.attempts)
+            self.logger.info("Retrying warmup in %.1fs", delay)
+            time.sleep(delay)
+
+    def run(self):
+        """
+        Импорт зависимостей и создание сессий с замером времени каждого шага.
+
+        Returns:
+            bool: True, если прогрев выполнен.
+        """
+        self.attempts += 1
+        started = time.perf_counter()
+
+        try:
+            for name in HEAVY_MODULES:
+                step_started = time.perf_counter()
+                importlib.import_module(name)
+                self.import_times[name] = round((time.perf_counter() - step_started) * 1000, 1)
+
+            # Конструктор YoutubeDL загружает классы всех экстракторов
+            step_started = time.perf_counter()
+            for options in self.profiles:
+                self.session_pool.prewarm(options)
+            self.import_times["extractors"] = round((time.perf_counter() - step_started) * 1000, 1)
+        except Exception as e:
+            self.error = str(e)
+            self.logger.error("Warmup attempt %s failed: %s", self.attempts, e)
+            return False
+
+        self.error = None
+        self.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._ready.set()
+        self.logger.info("Warmup finished in %.1f ms", self.duration_ms,
+                         extra={"stage": "warmup", "duration_ms": self.duration_ms,
+                                "import_times": self.import_times})
+        return True
+
+    def status(self):
+        """
+        Состояние готовности для /ready.
+
+        Returns:
+            dict: Готовность, время прогрева и импорта каждой зависимости.
+        """
+        if self.ready:
+            state = "ready"
+        elif self.error:
+            state = "failed"
+        else:
+            state = "warming_up"
+
+        status = {
+            "status": state,
+            "ready": self.ready,
+            "mode": "lazy" if self.lazy else "warmup",
+            "attempts": self.attempts,
+            "warmup_ms": self.duration_ms,
+            "import_times_ms": dict(self.import_times)
+        }
+        if self.error:
+            status["error"] = self.error
+        return status
@@ -0,0 +1,139 @@
+"""
+Локальный mock-источник видео для нагрузочного тестирования.
+Генерирует тестовые медиафайлы с помощью ffmpeg и отдает их по HTTP
+вместе с метаданными для плагина yt-dlp MockOriginIE.
+"""
+
+import os
+import json
+import re
+import subprocess
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+# Разрешения видеоформатов, которые отдает источник
+HEIGHTS = (360, 720, 1080)
+
+
+def generate_media(media_dir, duration=10):
+    """
+    Генерация тестовых видео-, аудиофайлов и обложки.
+
+    Args:
+        media_dir (str): Директория для файлов.
+        duration (int): Длительность в секундах.
+    """
+    os.makedirs(media_dir, exist_ok=True)
+
+    jobs = [
+        [
+            "-f", "lavfi", "-i", f"testsrc=size={height * 16 // 9}x{height}:rate=25",
+            "-t", str(duration), "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            os.path.join(media_dir, f"video-{height}.mp4")
+        ]
+        for height in HEIGHTS
+    ]
+    jobs.append([
+        "-f", "lavfi", "-i", "sine=frequency=440", "-t", str(duration),
+        "-c:a", "aac", "-b:a", "128k", os.path.join(media_dir, "audio.m4a")
+    ])
+    jobs.append([
+        "-f", "lavfi", "-i", "testsrc=size=1280x720", "-frames:v", "1",
+        os.path.join(media_dir, "thumb.jpg")
+    ])
+
+    for args in jobs:
+        if os.path.exists(args[-1]):
+            continue
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error"] + args, check=True)
+
+
+class MockOriginHandler(SimpleHTTPRequestHandler):
+    """Обработчик запросов mock-источника."""
+
+    # Переопределяются в MockOrigin
+    media_dir = None
+    latency = 0.0
+    duration = 10
+
+    def log_message(self, format, *args):
+        # Журнал запросов источника не нужен
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        match = re.fullmatch(r"/info/([\w-]+)\.json", self.path)
+        if match:
+            video_id = match.group(1)
+            self._send_json({
+                "title": f"Load test video {video_id}",
+                "duration": self.duration,
+                "heights": list(HEIGHTS),
+                "chapters": [{"title": "Intro", "start_time": 0, "end_time": self.duration}],
+            })
+            return
+
+        # Все видео используют одни и те же файлы: /media/<id>/<file>
+        match = re.fullmatch(r"/media/[\w-]+/([\w.-]+)", self.path)
+        if match:
+            self.path = f"/{match.group(1)}"
+            return super().do_GET()
+
+        self.send_error(404)
+
+    def translate_path(self, path):
+        return os.path.join(self.media_dir, os.path.basename(path))
+
+
+class MockOrigin:
+    """HTTP-сервер mock-источника в фоновом потоке."""
+
+    def __init__(self, media_dir, host="127.0.0.1", port=0, latency_ms=0, duration=10):
+        """
+        Инициализация источника.
+
+        Args:
+            media_dir (str): Директория с медиафайлами.
+            host (str): Адрес.
+            port (int): Порт (0 - любой свободный).
+            latency_ms (int): Искусственная задержка ответа в миллисекундах.
+            duration (int): Длительность тестовых файлов в секундах.
+        """
+        generate_media(media_dir, duration)
+
+        handler = type("Handler", (MockOriginHandler,), {
+            "media_dir": media_dir,
+            "latency": latency_ms / 1000,
+            "duration": duration,
+        })
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-origin", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def video_url(self, video_id):
+        """URL тестового видео в формате, который понимают сервис и MockOriginIE."""
+        return f"{self.base_url}/watch?v={video_id}"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
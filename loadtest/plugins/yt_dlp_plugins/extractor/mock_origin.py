@@ -0,0 +1,54 @@
+"""
+Плагин yt-dlp для нагрузочного тестирования: экстрактор локального mock-источника.
+Отвечает на URL вида http://127.0.0.1:<port>/watch?v=<id> и отдает раздельные
+видео- и аудиоформаты, как YouTube, но с локального сервера loadtest/mock_origin.py.
+"""
+
+from urllib.parse import urlparse
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class MockOriginIE(InfoExtractor):
+    """Экстрактор mock-источника нагрузочного теста."""
+
+    IE_NAME = 'mockorigin'
+    _VALID_URL = r'https?://(?:127\.0\.0\.1|localhost):\d+/watch\?v=(?P<id>[\w-]+)'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+
+        # Отдельный запрос метаданных имитирует сетевой обмен при извлечении
+        info = self._download_json(f"{origin}/info/{video_id}.json", video_id)
+
+        formats = [
+            {
+                'format_id': f"video-{height}",
+                'url': f"{origin}/media/{video_id}/video-{height}.mp4",
+                'ext': 'mp4',
+                'vcodec': 'avc1.42c01f',
+                'acodec': 'none',
+                'height': height,
+                'width': height * 16 // 9,
+            }
+            for height in info['heights']
+        ]
+        formats.append({
+            'format_id': 'audio',
+            'url': f"{origin}/media/{video_id}/audio.m4a",
+            'ext': 'm4a',
+            'vcodec': 'none',
+            'acodec': 'mp4a.40.2',
+            'abr': 128,
+        })
+
+        return {
+            'id': video_id,
+            'title': info['title'],
+            'duration': info['duration'],
+            'thumbnail': f"{origin}/media/{video_id}/thumb.jpg",
+            'chapters': info.get('chapters'),
+            'formats': formats,
+        }
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест HTTP API с локальным mock-источником видео.
+
+Запускает сервис (server.py) с временной конфигурацией, воспроизводит смесь
+запросов из trace-файла (JSONL) на нескольких уровнях конкурентности и измеряет
+пропускную способность, задержки, долю ошибок, число потоков и файловых
+дескрипторов сервера и рост памяти. При сравнении с сохраненным baseline
+завершается с ненулевым кодом, если регрессия превышает пороги.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import itertools
+import subprocess
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_origin import MockOrigin
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGINS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plugins")
+
+# Интервал опроса поставленной в очередь задачи в секундах
+POLL_INTERVAL = 0.2
+
+
+def load_trace(path):
+    """
+    Загрузка trace-файла: одна JSON-запись на строку.
+
+    Пример строки:
+        {"path": "/v1/youtube/download", "video": "lt001", "params": {"resolution": 720}, "client": "web-1"}
+
+    Поле client - API-ключ (заголовок X-API-Key), чтобы нагрузка шла от нескольких
+    клиентов справедливой очереди, а не от одного адреса 127.0.0.1.
+
+    Args:
+        path (str): Путь к trace-файлу.
+
+    Returns:
+        list: Записи trace.
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    if not entries:
+        raise ValueError(f"Trace file is empty: {path}")
+    return entries
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка."""
+    if not values:
+        return 0.0
+    index = min(int(len(values) * fraction), len(values) - 1)
+    return values[index]
+
+
+class ServerProcess:
+    """Сервис, запущенный в отдельном процессе с временной конфигурацией."""
+
+    def __init__(self, work_dir, port, config_path, api_keys=()):
+        """
+        Args:
+            work_dir (str): Временная директория для загрузок, логов и конфигурации.
+            port (int): Порт сервиса.
+            config_path (str): Исходный config.json.
+            api_keys (iterable): API-ключи клиентов из trace.
+        """
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        config["server"]["host"] = "127.0.0.1"
+        config["server"]["port"] = port
+        config["downloader"]["download_dir"] = os.path.join(work_dir, "downloads")
+        config["downloader"]["temp_dir"] = os.path.join(work_dir, "temp")
+        config["downloader"]["log_file"] = os.path.join(work_dir, "server.log")
+        config["downloader"]["base_url"] = f"http://127.0.0.1:{port}/media"
+        config.setdefault("prefetch", {})["enabled"] = False
+        config["api"]["api_keys"] = sorted(set(config["api"].get("api_keys", [])) | set(api_keys))
+
+        self.config_path = os.path.join(work_dir, "config.json")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=4)
+
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.process = None
+        self.startup = {}
+
+    def _wait_for(self, path, deadline):
+        """Ожидание ответа 200 на path; возвращает время от запуска процесса в мс."""
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            try:
+                urllib.request.urlopen(f"{self.base_url}{path}", timeout=1).read()
+                return round((time.monotonic() - self._started) * 1000, 1)
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.05)
+
+        raise RuntimeError(f"Server did not answer {path} in time")
+
+    def start(self, timeout=60):
+        """Запуск сервиса, ожидание /health (порт открыт) и /ready (зависимости загружены)."""
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PLUGINS_DIR, ROOT_DIR, env.get("PYTHONPATH")]))
+
+        self._started = time.monotonic()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT_DIR, "server.py"), "--config", self.config_path],
+            cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+        deadline = self._started + timeout
+        self.startup["startup_live_ms"] = self._wait_for("/health", deadline)
+        self.startup["startup_ready_ms"] = self._wait_for("/ready", deadline)
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def resources(self):
+        """
+        Потоки, файловые дескрипторы и RSS процесса сервиса (Linux /proc).
+
+        Returns:
+            dict: threads, fds, rss_mb или None, если /proc недоступен.
+        """
+        pid = self.process.pid
+        try:
+            with open(f"/proc/{pid}/status", "r") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+            return {
+                "threads": int(status["Threads"].strip()),
+                "fds": len(os.listdir(f"/proc/{pid}/fd")),
+                "rss_mb": int(status["VmRSS"].split()[0]) / 1024,
+            }
+        except (OSError, KeyError, ValueError):
+            return None
+
+
+class ResourceSampler(threading.Thread):
+    """Периодический сбор ресурсов сервиса."""
+
+    def __init__(self, server, interval=1.0):
+        super().__init__(name="resource-sampler", daemon=True)
+        self.server = server
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            sample = self.server.resources()
+            if sample:
+                sample["time"] = time.monotonic()
+                self.samples.append(sample)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class LoadGenerator:
+    """Воспроизведение trace с заданной конкурентностью."""
+
+    def __init__(self, server, origin, trace, timeout, fresh_videos=True):
+        """
+        Args:
+            server (ServerProcess): Сервис под нагрузкой.
+            origin (MockOrigin): Источник видео.
+            trace (list): Записи trace.
+            timeout (float): Таймаут запроса клиента.
+            fresh_videos (bool): Добавлять номер прохода по trace к ID видео, чтобы каждый
+                проход загружал новые видео, а не отдавал результаты из кэша.
+        """
+        self.server = server
+        self.origin = origin
+        self.trace = trace
+        self.timeout = timeout
+        self.fresh_videos = fresh_videos
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def _next_request(self):
+        """URL и заголовки следующего запроса trace."""
+        with self._lock:
+            iteration, index = divmod(self._position, len(self.trace))
+            self._position += 1
+        entry = self.trace[index]
+
+        params = dict(entry.get("params", {}))
+        if entry.get("video"):
+            video = f"{entry['video']}-p{iteration}" if self.fresh_videos else entry["video"]
+            params["url"] = self.origin.video_url(video)
+
+        query = urllib.parse.urlencode(params)
+        headers = {"X-API-Key": entry["client"]} if entry.get("client") else {}
+        return f"{self.server.base_url}{entry['path']}" + (f"?{query}" if query else ""), headers
+
+    def _request(self, url, headers):
+        """
+        Запрос с ожиданием поставленной в очередь задачи (202 -> опрос status_url).
+
+        Returns:
+            int: HTTP-код итогового ответа (202, если задача не завершилась за таймаут).
+        """
+        started = time.monotonic()
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=self.timeout) as response:
+            body = json.loads(response.read() or b"{}")
+            status = response.status
+
+        while status == 202 and time.monotonic() - started < self.timeout:
+            time.sleep(POLL_INTERVAL)
+            status_request = urllib.request.Request(f"{self.server.base_url}{body['status_url']}", headers=headers)
+            with urllib.request.urlopen(status_request, timeout=self.timeout) as response:
+                body = json.loads(response.read() or b"{}")
+                status = response.status
+
+        return status
+
+    def _client(self, deadline, results):
+        """Клиент: отправляет запросы друг за другом до окончания шага."""
+        while time.monotonic() < deadline:
+            url, headers = self._next_request()
+            started = time.monotonic()
+            try:
+                status = self._request(url, headers)
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, OSError, ValueError):
+                status = None
+            results.append((time.monotonic() - started, status))
+
+    def run_step(self, concurrency, seconds):
+        """
+        Один шаг нагрузки.
+
+        Args:
+            concurrency (int): Количество одновременных клиентов.
+            seconds (float): Длительность шага.
+
+        Returns:
+            dict: Метрики шага.
+        """
+        results = []
+        started = time.monotonic()
+        deadline = started + seconds
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(concurrency):
+                executor.submit(self._client, deadline, results)
+
+        elapsed = time.monotonic() - started
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        # Ошибкой считается любой ответ не из 2xx: 404 или 429 вместо загрузки - не успех;
+        # 429 дополнительно считается отдельно, чтобы было видно переполнение очереди
+        errors = sum(1 for _, status in results if status is None or not 200 <= status < 300)
+        rate_limited = sum(1 for _, status in results if status == 429)
+
+        return {
+            "concurrency": concurrency,
+            "requests": len(results),
+            "throughput_rps": round(len(results) / elapsed, 2),
+            "error_rate": round(errors / len(results), 4) if results else 1.0,
+            "rate_limited_rate": round(rate_limited / len(results), 4) if results else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "latencies": latencies,
+        }
+
+
+def summarize(steps, samples, startup=None):
+    """
+    Итоговые метрики прогона.
+
+    Args:
+        steps (list): Метрики шагов.
+        samples (list): Замеры ресурсов сервиса.
+        startup (dict, optional): Время до ответа /health и /ready.
+
+    Returns:
+        dict: Итоговые метрики.
+    """
+    latencies = sorted(itertools.chain.from_iterable(step.pop("latencies") for step in steps))
+    total = sum(step["requests"] for step in steps)
+    errors = sum(step["error_rate"] * step["requests"] for step in steps)
+    rate_limited = sum(step["rate_limited_rate"] * step["requests"] for step in steps)
+
+    summary = {
+        "saturation_rps": max(step["throughput_rps"] for step in steps),
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "error_rate": round(errors / total, 4) if total else 1.0,
+        "rate_limited_rate": round(rate_limited / total, 4) if total else 0.0,
+        "steps": steps,
+    }
+    summary.update(startup or {})
+
+    if samples:
+        summary["max_threads"] = max(sample["threads"] for sample in samples)
+        summary["max_fds"] = max(sample["fds"] for sample in samples)
+        summary["rss_start_mb"] = round(samples[0]["rss_mb"], 1)
+        summary["rss_end_mb"] = round(samples[-1]["rss_mb"], 1)
+        summary["rss_growth_mb"] = round(samples[-1]["rss_mb"] - samples[0]["rss_mb"], 1)
+
+    return summary
+
+
+def compare(summary, baseline, thresholds):
+    """
+    Сравнение с baseline.
+
+    Формат порогов:
+        {"saturation_rps": {"max_drop_pct": 10}, "p99_ms": {"max_increase_pct": 20},
+         "error_rate": {"max_increase": 0.01}}
+
+    Returns:
+        list: Описания регрессий (пустой список, если регрессий нет).
+    """
+    regressions = []
+
+    for metric, rule in thresholds.items():
+        if metric not in summary or metric not in baseline:
+            continue
+
+        current, previous = summary[metric], baseline[metric]
+
+        if "max_drop_pct" in rule and previous > 0:
+            drop = (previous - current) / previous * 100
+            if drop > rule["max_drop_pct"]:
+                regressions.append(f"{metric}: {previous} -> {current} (-{drop:.1f}% > {rule['max_drop_pct']}%)")
+        if "max_increase_pct" in rule and previous > 0:
+            increase = (current - previous) / previous * 100
+            if increase > rule["max_increase_pct"]:
+                regressions.append(f"{metric}: {previous} -> {current} (+{increase:.1f}% > {rule['max_increase_pct']}%)")
+        if "max_increase" in rule:
+            increase = current - previous
+            if increase > rule["max_increase"]:
+                regressions.append(f"{metric}: {previous} -> {current} (+{increase:g} > {rule['max_increase']})")
+
+    return regressions
+
+
+def main():
+    """Разбор аргументов, запуск нагрузочного теста и сравнение с baseline."""
+    parser = argparse.ArgumentParser(description="Load test for YouTube Downloader API Service")
+    parser.add_argument("--config", default=os.path.join(ROOT_DIR, "config.json"), help="Base service configuration")
+    parser.add_argument("--trace", default=os.path.join(os.path.dirname(__file__), "trace.jsonl"), help="Trace file (JSONL)")
+    parser.add_argument("--concurrency", default="100,250,500,1000", help="Comma-separated concurrency steps")
+    parser.add_argument("--step-seconds", type=float, default=30, help="Duration of each step")
+    parser.add_argument("--timeout", type=float, default=300, help="Client request timeout")
+    parser.add_argument("--port", type=int, default=5099, help="Port for the service under test")
+    parser.add_argument("--origin-latency-ms", type=int, default=0, help="Artificial latency of the mock origin")
+    parser.add_argument("--media-seconds", type=int, default=10, help="Duration of generated test media")
+    parser.add_argument("--cached-videos", action="store_true",
+                        help="Replay the same video IDs on every trace pass instead of suffixing them with the pass "
+                             "number, so later passes are served from the result cache")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(__file__), "baseline.json"), help="Baseline results")
+    parser.add_argument("--thresholds", default=os.path.join(os.path.dirname(__file__), "thresholds.json"), help="Regression thresholds")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--no-baseline", action="store_true", help="Only report results, without the regression check")
+    args = parser.parse_args()
+
+    # Без baseline проверка регрессий ничего не гарантирует, поэтому пропуск только явный
+    if not args.save_baseline and not args.no_baseline and not os.path.exists(args.baseline):
+        print(f"Baseline not found: {args.baseline}; record one with --save-baseline or pass --no-baseline")
+        sys.exit(2)
+
+    trace = load_trace(args.trace)
+    work_dir = tempfile.mkdtemp(prefix="ytdl-loadtest-")
+
+    # Условия прогона: сравнивать можно только с baseline, снятым при тех же условиях
+    settings = {
+        "trace": os.path.basename(args.trace),
+        "trace_entries": len(trace),
+        "concurrency": args.concurrency,
+        "step_seconds": args.step_seconds,
+        "origin_latency_ms": args.origin_latency_ms,
+        "media_seconds": args.media_seconds,
+        "fresh_videos": not args.cached_videos,
+    }
+
+    origin = MockOrigin(os.path.join(work_dir, "origin"), latency_ms=args.origin_latency_ms, duration=args.media_seconds)
+    server = ServerProcess(work_dir, args.port, args.config,
+                           api_keys=[entry["client"] for entry in trace if entry.get("client")])
+
+    try:
+        origin.start()
+        server.start()
+
+        sampler = ResourceSampler(server)
+        sampler.start()
+        print(f"startup: live in {server.startup['startup_live_ms']} ms, "
+              f"ready in {server.startup['startup_ready_ms']} ms")
+
+        generator = LoadGenerator(server, origin, trace, args.timeout, not args.cached_videos)
+        steps = []
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            step = generator.run_step(concurrency, args.step_seconds)
+            steps.append(step)
+            print(f"concurrency={concurrency}: {step['throughput_rps']} rps, "
+                  f"p99={step['p99_ms']} ms, errors={step['error_rate']:.2%} "
+                  f"(429: {step['rate_limited_rate']:.2%})")
+
+        sampler.stop()
+        summary = summarize(steps, sampler.samples, server.startup)
+        summary["settings"] = settings
+    finally:
+        server.stop()
+        origin.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps({k: v for k, v in summary.items() if k not in ("steps", "settings")}, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        return
+
+    if args.no_baseline:
+        print("Regression check skipped (--no-baseline)")
+        return
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"Baseline was recorded with different settings: {baseline.get('settings')}")
+        sys.exit(2)
+    with open(args.thresholds, "r", encoding="utf-8") as f:
+        thresholds = json.load(f)
+
+    regressions = compare(summary, baseline, thresholds)
+    if regressions:
+        print("Regressions detected:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    main()